@@ -0,0 +1,262 @@
+import asyncio
+import os
+import time
+from collections import deque
+from typing import Deque, List, Optional, Set
+
+from app.database.redis_pool import redis_client
+from app.metrics import count_error, metrics
+
+QUEUE_KEY = "payment_queue"
+
+# Acima da marca alta a API para de empurrar direto para o Redis e aplica a
+# política; volta ao normal só abaixo da marca baixa (histerese)
+QUEUE_HIGH_WATERMARK = int(os.getenv("QUEUE_HIGH_WATERMARK", "50000"))
+QUEUE_LOW_WATERMARK = int(os.getenv("QUEUE_LOW_WATERMARK", "40000"))
+# "shed" responde 503, "spill" guarda no buffer local, "delay" segura a resposta
+QUEUE_OVERFLOW_POLICY = os.getenv("QUEUE_OVERFLOW_POLICY", "spill")
+QUEUE_SPILL_MAX = int(os.getenv("QUEUE_SPILL_MAX", "10000"))
+QUEUE_DELAY_MAX_MS = float(os.getenv("QUEUE_DELAY_MAX_MS", "500"))
+# Intervalo mínimo entre LLENs enquanto a fila está acima da marca
+QUEUE_PROBE_MS = float(os.getenv("QUEUE_PROBE_MS", "50"))
+SPILL_DRAIN_BATCH = 100
+
+# Coalescência: requisições simultâneas entram em um buffer local que vira um
+# único RPUSH multi-valor a cada INGEST_FLUSH_US ou INGEST_BATCH_MAX itens.
+# Os timers do loop têm resolução de ~1 ms; 0 envia ao fim da iteração atual.
+INGEST_COALESCE = os.getenv("INGEST_COALESCE", "1") == "1"
+INGEST_FLUSH_US = float(os.getenv("INGEST_FLUSH_US", "200"))
+INGEST_BATCH_MAX = int(os.getenv("INGEST_BATCH_MAX", "64"))
+# "buffer" responde 201 ao entrar no buffer (enquanto houver lugar reservado
+# no buffer de overflow para o caso de o RPUSH falhar); "flush" segura a
+# resposta até o RPUSH confirmar e, se falhar, aplica a política de overflow
+INGEST_ACK = os.getenv("INGEST_ACK", "buffer")
+
+RPUSH_LATENCY = metrics.histogram("redis_op_ms", op="rpush")
+QUEUE_DEPTH = metrics.histogram("queue_depth_observed")
+INGEST_BATCH = metrics.histogram("ingest_batch_size")
+
+
+class QueueBackpressure:
+    def __init__(
+        self,
+        key: str = QUEUE_KEY,
+        high: int = QUEUE_HIGH_WATERMARK,
+        low: int = QUEUE_LOW_WATERMARK,
+        policy: str = QUEUE_OVERFLOW_POLICY,
+        spill_max: int = QUEUE_SPILL_MAX,
+        coalesce: bool = INGEST_COALESCE,
+        flush_us: float = INGEST_FLUSH_US,
+        batch_max: int = INGEST_BATCH_MAX,
+        ack: str = INGEST_ACK,
+    ):
+        self.key = key
+        self.high = high
+        self.low = min(low, high)
+        self.policy = policy
+        self.spill_max = spill_max
+        self.depth = 0
+        self.overloaded = False
+        self.spill: Deque[bytes] = deque()
+        self._probe_interval = QUEUE_PROBE_MS / 1000
+        self._last_probe = 0.0
+        self._drainer: Optional[asyncio.Task] = None
+        self.coalesce = coalesce
+        self.flush_delay = flush_us / 1_000_000
+        self.batch_max = batch_max
+        self.wait_flush = ack == "flush"
+        self.pending: List[bytes] = []
+        # Por item do lote: já respondido com 201 antes do RPUSH
+        self._acked: List[bool] = []
+        # Lugares do buffer de overflow já comprometidos: pagamentos
+        # respondidos antes do RPUSH e lotes em drenagem
+        self._reserved = 0
+        self._flushed: Optional[asyncio.Future] = None
+        self._timer: Optional[asyncio.Handle] = None
+        self._flushes: Set[asyncio.Task] = set()
+
+    def observe(self, depth: int):
+        # O RPUSH já devolve o tamanho da fila: acompanhar custa zero round-trips
+        self.depth = depth
+        QUEUE_DEPTH.record(depth)
+        if depth >= self.high:
+            self.overloaded = True
+        elif depth <= self.low:
+            self.overloaded = False
+
+    async def probe(self):
+        now = time.monotonic()
+        if now - self._last_probe < self._probe_interval:
+            return
+        self._last_probe = now
+        self.observe(await redis_client.llen(self.key))
+
+    async def _rpush(self, *entries: bytes):
+        start = time.perf_counter()
+        depth = await redis_client.rpush(self.key, *entries)
+        RPUSH_LATENCY.record((time.perf_counter() - start) * 1000)
+        self.observe(depth)
+
+    async def push(self, entry: bytes) -> int:
+        # Retorna o status HTTP do POST /payments
+        if self.overloaded:
+            await self.probe()
+        if not self.overloaded:
+            if self.coalesce:
+                return await self._coalesce(entry)
+            await self._rpush(entry)
+            return 201
+
+        if self.policy == "spill":
+            return self._spill(entry)
+        if self.policy == "delay":
+            return await self._delay(entry)
+        metrics.inc("queue_shed_total", policy="shed")
+        return 503
+
+    async def _coalesce(self, entry: bytes) -> int:
+        loop = asyncio.get_running_loop()
+        acked = not self.wait_flush and self._spill_used() < self.spill_max
+        if acked:
+            self._reserved += 1
+        index = len(self.pending)
+        self.pending.append(entry)
+        self._acked.append(acked)
+        if self._flushed is None:
+            self._flushed = loop.create_future()
+        flushed = self._flushed
+
+        if len(self.pending) >= self.batch_max:
+            self._flush_pending()
+        elif self._timer is None:
+            if self.flush_delay > 0:
+                self._timer = loop.call_later(self.flush_delay, self._flush_pending)
+            else:
+                self._timer = loop.call_soon(self._flush_pending)
+
+        if acked:
+            return 201
+        # Sem lugar garantido no overflow a resposta espera o lote
+        statuses = await asyncio.shield(flushed)
+        return statuses[index]
+
+    def _flush_pending(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self.pending:
+            return
+        batch, acked, flushed = self.pending, self._acked, self._flushed
+        self.pending, self._acked, self._flushed = [], [], None
+        task = asyncio.create_task(self._flush(batch, acked, flushed))
+        self._flushes.add(task)
+        task.add_done_callback(self._flushes.discard)
+
+    async def _flush(
+        self, batch: List[bytes], acked: List[bool], flushed: asyncio.Future
+    ):
+        INGEST_BATCH.record(len(batch))
+        pushed = False
+        try:
+            await self._rpush(*batch)
+            pushed = True
+        except Exception:
+            count_error("ingest_flush")
+        finally:
+            # Também se a tarefa for cancelada: as reservas são liberadas e
+            # quem espera o lote sempre recebe um status
+            self._reserved -= sum(acked)
+            statuses = [201] * len(batch)
+            if not pushed:
+                # Os já respondidos ocupam o lugar reservado no buffer de
+                # overflow, que tenta de novo até o Redis aceitar; os que
+                # esperam o lote seguem a política de overflow
+                for i, entry in enumerate(batch):
+                    if acked[i]:
+                        self.spill.append(entry)
+                    else:
+                        statuses[i] = self._overflow(entry)
+                metrics.set_gauge("spill_buffer", len(self.spill))
+                self._start_drainer()
+            if not flushed.done():
+                flushed.set_result(statuses)
+
+    def _overflow(self, entry: bytes) -> int:
+        # RPUSH do lote falhou para um pagamento ainda sem resposta; "delay"
+        # espera a fila baixar, o que não ajuda com o Redis falhando, então
+        # responde 503 como "shed"
+        if self.policy == "spill":
+            return self._spill(entry)
+        metrics.inc("queue_shed_total", policy=self.policy)
+        return 503
+
+    async def drain(self):
+        # Shutdown: lote em formação e buffer de overflow vão para a fila
+        self._flush_pending()
+        if self._flushes:
+            await asyncio.gather(*self._flushes, return_exceptions=True)
+        await self.drain_spill(force=True)
+
+    def _spill_used(self) -> int:
+        return len(self.spill) + self._reserved
+
+    def _spill(self, entry: bytes) -> int:
+        if self._spill_used() >= self.spill_max:
+            metrics.inc("queue_shed_total", policy="spill")
+            return 503
+        self.spill.append(entry)
+        metrics.inc("queue_spilled_total")
+        metrics.set_gauge("spill_buffer", len(self.spill))
+        self._start_drainer()
+        return 201
+
+    def _start_drainer(self):
+        if self._drainer is None or self._drainer.done():
+            self._drainer = asyncio.create_task(self.drain_spill())
+
+    async def _delay(self, entry: bytes) -> int:
+        metrics.inc("queue_delayed_total")
+        deadline = time.monotonic() + QUEUE_DELAY_MAX_MS / 1000
+        while self.overloaded:
+            if time.monotonic() >= deadline:
+                metrics.inc("queue_shed_total", policy="delay")
+                return 503
+            await asyncio.sleep(self._probe_interval)
+            await self.probe()
+        await self._rpush(entry)
+        return 201
+
+    async def drain_spill(self, force: bool = False):
+        # Devolve o buffer para o Redis em lotes assim que a fila baixa;
+        # force ignora as marcas (shutdown)
+        while self.spill:
+            if self.overloaded and not force:
+                await asyncio.sleep(self._probe_interval)
+                try:
+                    await self.probe()
+                except Exception:
+                    count_error("queue_probe")
+                continue
+
+            batch = [
+                self.spill.popleft()
+                for _ in range(min(SPILL_DRAIN_BATCH, len(self.spill)))
+            ]
+            # O lote continua contando no limite enquanto o RPUSH não confirma,
+            # então a devolução em caso de falha nunca passa de spill_max
+            self._reserved += len(batch)
+            try:
+                await self._rpush(*batch)
+            except Exception:
+                self._reserved -= len(batch)
+                self.spill.extendleft(reversed(batch))
+                count_error("spill_drain")
+                if force:
+                    break
+                await asyncio.sleep(self._probe_interval)
+            else:
+                self._reserved -= len(batch)
+            metrics.set_gauge("spill_buffer", len(self.spill))
+
+
+ingest_queue = QueueBackpressure()
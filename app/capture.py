@@ -0,0 +1,116 @@
+import asyncio
+import os
+import struct
+import time
+from typing import Iterator, Optional, Tuple
+
+import orjson
+
+from app.metrics import count_error
+
+# Arquivo de captura dos POST /payments; vazio desliga. Extensão .bin grava
+# registros binários (cabeçalho + corpo), qualquer outra grava JSONL
+# ({"t": epoch em µs, "body": corpo}). Com vários processos da API todos
+# anexam ao mesmo arquivo em blocos (um por flush), então os registros só
+# estão em ordem dentro de cada processo; o replay ordena pelo timestamp.
+CAPTURE_PATH = os.getenv("CAPTURE_PATH", "")
+# Escrita em lote: só vai ao disco quando o buffer enche ou envelhece (o
+# flusher do lifespan cobre os períodos sem requisições)
+CAPTURE_BUFFER_BYTES = int(os.getenv("CAPTURE_BUFFER_BYTES", "65536"))
+CAPTURE_FLUSH_MS = float(os.getenv("CAPTURE_FLUSH_MS", "1000"))
+
+# Registro binário: epoch em µs e tamanho do corpo
+CAPTURE_HEADER = struct.Struct("<QI")
+
+
+class TrafficCapture:
+    def __init__(
+        self,
+        path: str,
+        buffer_bytes: int = CAPTURE_BUFFER_BYTES,
+        flush_ms: float = CAPTURE_FLUSH_MS,
+    ):
+        self.path = path
+        self.binary = is_binary_capture(path)
+        self.buffer_bytes = buffer_bytes
+        self.flush_interval = flush_ms / 1000
+        self.buffer = bytearray()
+        self.records = 0
+        self._last_flush = time.monotonic()
+        self._fd: Optional[int] = None
+
+    def record(self, body: bytes):
+        # Chamado no caminho quente: só anexa ao buffer
+        received_us = time.time_ns() // 1000
+        if self.binary:
+            self.buffer += CAPTURE_HEADER.pack(received_us, len(body))
+            self.buffer += body
+        else:
+            self.buffer += orjson.dumps(
+                {"t": received_us, "body": body.decode("utf-8", "replace")},
+                option=orjson.OPT_APPEND_NEWLINE,
+            )
+        self.records += 1
+
+        if (
+            len(self.buffer) >= self.buffer_bytes
+            or time.monotonic() - self._last_flush >= self.flush_interval
+        ):
+            self.flush()
+
+    def flush(self):
+        self._last_flush = time.monotonic()
+        if not self.buffer:
+            return
+        try:
+            if self._fd is None:
+                # O_APPEND: cada write vai inteiro para o fim, mesmo com vários processos
+                flags = os.O_WRONLY | os.O_CREAT | os.O_APPEND
+                self._fd = os.open(self.path, flags, 0o644)
+            os.write(self._fd, self.buffer)
+        except OSError:
+            # A captura nunca derruba o POST /payments: o lote é descartado
+            count_error("capture")
+        self.buffer.clear()
+
+    async def run_flusher(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            if (
+                self.buffer
+                and time.monotonic() - self._last_flush >= self.flush_interval
+            ):
+                self.flush()
+
+    def close(self):
+        self.flush()
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+
+def is_binary_capture(path: str) -> bool:
+    return path.endswith(".bin")
+
+
+def read_capture(path: str) -> Iterator[Tuple[int, bytes]]:
+    # (epoch em µs, corpo) na ordem do arquivo
+    if not is_binary_capture(path):
+        with open(path, "rb") as f:
+            for line in f:
+                if line.strip():
+                    record = orjson.loads(line)
+                    yield record["t"], record["body"].encode()
+        return
+
+    with open(path, "rb") as f:
+        data = f.read()
+    offset = 0
+    while offset + CAPTURE_HEADER.size <= len(data):
+        received_us, size = CAPTURE_HEADER.unpack_from(data, offset)
+        offset += CAPTURE_HEADER.size
+        yield received_us, data[offset : offset + size]
+        offset += size
+
+
+traffic_capture = TrafficCapture(CAPTURE_PATH) if CAPTURE_PATH else None
@@ -1,16 +1,35 @@
-import httpx
-from typing import Optional
+import os
+from typing import TYPE_CHECKING, Iterable, Optional
+
+from app.client.transport import HttpxTransport, RawHttpTransport, Transport
+from app.config import get_settings
+from app.memory import http_pool_size
+
+if TYPE_CHECKING:
+    import httpx
+
+# "httpx" ou "raw" (HTTP/1.1 mínimo sobre asyncio streams)
+HTTP_TRANSPORT = os.getenv("HTTP_TRANSPORT", "httpx")
+# Conexões abertas para cada processor na inicialização do worker
+WARMUP_CONNECTIONS = int(os.getenv("WARMUP_CONNECTIONS", "10"))
 
 # Sessão HTTP
-_http_client: Optional[httpx.AsyncClient] = None
+_http_client: Optional["httpx.AsyncClient"] = None
+_transport: Optional[Transport] = None
 
 
-async def get_httpx_client() -> httpx.AsyncClient:
+async def get_httpx_client() -> "httpx.AsyncClient":
     global _http_client
 
     if _http_client is None:
+        import httpx
+
+        # Uma conexão por requisição simultânea permitida em cada processor
+        max_connections = http_pool_size(get_settings().processor_max_concurrency * 2)
         limits = httpx.Limits(
-            max_keepalive_connections=30, max_connections=30, keepalive_expiry=300.0
+            max_keepalive_connections=max_connections,
+            max_connections=max_connections,
+            keepalive_expiry=300.0,
         )
 
         # Timeouts para processamento de pagamentos
@@ -29,8 +48,30 @@ async def get_httpx_client() -> httpx.AsyncClient:
     return _http_client
 
 
+async def get_transport() -> Transport:
+    global _transport
+
+    if _transport is None:
+        if HTTP_TRANSPORT == "raw":
+            _transport = RawHttpTransport(
+                max_idle=http_pool_size(get_settings().processor_max_concurrency)
+            )
+        else:
+            _transport = HttpxTransport(await get_httpx_client())
+
+    return _transport
+
+
+async def warmup_transport(urls: Iterable[str], connections: int = WARMUP_CONNECTIONS):
+    transport = await get_transport()
+    await transport.warmup(urls, connections)
+
+
 async def cleanup_http_client():
-    global _http_client
+    global _http_client, _transport
+    if _transport and not isinstance(_transport, HttpxTransport):
+        await _transport.aclose()
+    _transport = None
     if _http_client:
         await _http_client.aclose()
         _http_client = None
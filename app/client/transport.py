@@ -0,0 +1,217 @@
+import asyncio
+from collections import deque
+from typing import TYPE_CHECKING, Deque, Dict, Iterable, Optional, Protocol, Tuple
+from urllib.parse import urlsplit
+
+# httpx (e ssl, certifi, idna, email) só é importado com HTTP_TRANSPORT=httpx
+if TYPE_CHECKING:
+    import httpx
+
+
+class Transport(Protocol):
+    async def post(
+        self, url: str, body: bytes, timeout: float
+    ) -> Tuple[int, bytes]: ...
+
+    async def get(self, url: str, timeout: float) -> Tuple[int, bytes]: ...
+
+    async def warmup(self, urls: Iterable[str], connections: int): ...
+
+    async def aclose(self): ...
+
+
+class HttpxTransport:
+    def __init__(self, client: "httpx.AsyncClient"):
+        self.client = client
+
+    async def post(self, url: str, body: bytes, timeout: float) -> Tuple[int, bytes]:
+        response = await self.client.post(
+            url,
+            content=body,
+            headers={"Content-Type": "application/json"},
+            timeout=timeout,
+        )
+        return response.status_code, response.content
+
+    async def get(self, url: str, timeout: float) -> Tuple[int, bytes]:
+        response = await self.client.get(url, timeout=timeout)
+        return response.status_code, response.content
+
+    async def warmup(self, urls: Iterable[str], connections: int):
+        # httpx não abre conexões sem requisição: GETs simultâneos enchem o pool
+        await asyncio.gather(
+            *(
+                self.client.get(url, timeout=1.0)
+                for url in urls
+                for _ in range(connections)
+            ),
+            return_exceptions=True,
+        )
+
+    async def aclose(self):
+        await self.client.aclose()
+
+
+class _NoResponse(ConnectionError):
+    # Conexão caiu antes de qualquer byte da resposta: em uma conexão reusada
+    # é o servidor fechando a ociosa, único caso em que reenviar é seguro
+    pass
+
+
+class _Endpoint:
+    # Conexões keep-alive e prefixos de requisição pré-montados de um host
+    def __init__(self, host: str, port: int, max_idle: int):
+        self.host = host
+        self.port = port
+        self.max_idle = max_idle
+        self.idle: Deque[Tuple[asyncio.StreamReader, asyncio.StreamWriter]] = deque()
+        self.host_header = f"Host: {host}:{port}\r\n".encode()
+
+
+class RawHttpTransport:
+    # Cliente HTTP/1.1 mínimo sobre asyncio streams: envia bytes prontos e lê
+    # apenas a linha de status e os cabeçalhos necessários para drenar o corpo
+    def __init__(self, max_idle: int = 100, connect_timeout: float = 0.5):
+        self.max_idle = max_idle
+        self.connect_timeout = connect_timeout
+        self._endpoints: Dict[Tuple[str, int], _Endpoint] = {}
+        self._paths: Dict[str, Tuple[_Endpoint, bytes]] = {}
+
+    def _resolve(self, url: str) -> Tuple[_Endpoint, bytes]:
+        cached = self._paths.get(url)
+        if cached is not None:
+            return cached
+
+        parts = urlsplit(url)
+        port = parts.port or 80
+        key = (parts.hostname, port)
+        endpoint = self._endpoints.get(key)
+        if endpoint is None:
+            endpoint = _Endpoint(parts.hostname, port, self.max_idle)
+            self._endpoints[key] = endpoint
+
+        path = (parts.path or "/").encode()
+        if parts.query:
+            path += b"?" + parts.query.encode()
+        self._paths[url] = (endpoint, path)
+        return endpoint, path
+
+    async def _connect(self, endpoint: _Endpoint):
+        return await asyncio.wait_for(
+            asyncio.open_connection(endpoint.host, endpoint.port),
+            timeout=self.connect_timeout,
+        )
+
+    async def _acquire(self, endpoint: _Endpoint):
+        while endpoint.idle:
+            reader, writer = endpoint.idle.pop()
+            if not writer.is_closing() and not reader.at_eof():
+                return reader, writer, True
+            writer.close()
+        reader, writer = await self._connect(endpoint)
+        return reader, writer, False
+
+    def _release(self, endpoint: _Endpoint, reader, writer, reusable: bool):
+        if reusable and len(endpoint.idle) < endpoint.max_idle:
+            endpoint.idle.append((reader, writer))
+        else:
+            writer.close()
+
+    async def _read_response(
+        self, reader: asyncio.StreamReader
+    ) -> Tuple[int, bytes, bool]:
+        try:
+            status_line = await reader.readline()
+        except ConnectionError as e:
+            raise _NoResponse(str(e)) from e
+        if not status_line:
+            raise _NoResponse("connection closed by processor")
+        status = int(status_line[9:12])
+
+        length = 0
+        chunked = False
+        keep_alive = True
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.partition(b":")
+            name = name.strip().lower()
+            if name == b"content-length":
+                length = int(value)
+            elif name == b"transfer-encoding":
+                chunked = b"chunked" in value.lower()
+            elif name == b"connection":
+                keep_alive = b"close" not in value.lower()
+
+        if chunked:
+            body = bytearray()
+            while True:
+                size = int((await reader.readline()).split(b";")[0], 16)
+                if size == 0:
+                    await reader.readline()
+                    break
+                body += await reader.readexactly(size)
+                await reader.readline()
+            return status, bytes(body), keep_alive
+
+        body = await reader.readexactly(length) if length else b""
+        return status, body, keep_alive
+
+    async def _request(
+        self, method: bytes, url: str, body: Optional[bytes], timeout: float
+    ) -> Tuple[int, bytes]:
+        endpoint, path = self._resolve(url)
+
+        head = method + b" " + path + b" HTTP/1.1\r\n" + endpoint.host_header
+        if body is not None:
+            head += b"Content-Type: application/json\r\nContent-Length: %d\r\n" % len(
+                body
+            )
+        request = head + b"\r\n" + (body or b"")
+
+        while True:
+            reader, writer, reused = await self._acquire(endpoint)
+            try:
+                writer.write(request)
+                status, content, keep_alive = await asyncio.wait_for(
+                    self._read_response(reader), timeout=timeout
+                )
+            except _NoResponse:
+                writer.close()
+                # Conexão ociosa fechada pelo servidor: tenta de novo com uma nova
+                if reused:
+                    continue
+                raise
+            except BaseException:
+                # Resposta parcial (o processor já tratou o pagamento, reenviar
+                # pode cobrar duas vezes): a conexão não volta para o pool
+                writer.close()
+                raise
+
+            self._release(endpoint, reader, writer, keep_alive)
+            return status, content
+
+    async def post(self, url: str, body: bytes, timeout: float) -> Tuple[int, bytes]:
+        return await self._request(b"POST", url, body, timeout)
+
+    async def get(self, url: str, timeout: float) -> Tuple[int, bytes]:
+        return await self._request(b"GET", url, None, timeout)
+
+    async def warmup(self, urls: Iterable[str], connections: int):
+        for url in urls:
+            endpoint, _ = self._resolve(url)
+            opened = await asyncio.gather(
+                *(self._connect(endpoint) for _ in range(connections)),
+                return_exceptions=True,
+            )
+            for conn in opened:
+                if not isinstance(conn, BaseException):
+                    reader, writer = conn
+                    self._release(endpoint, reader, writer, True)
+
+    async def aclose(self):
+        for endpoint in self._endpoints.values():
+            while endpoint.idle:
+                _, writer = endpoint.idle.pop()
+                writer.close()
@@ -1,4 +1,5 @@
 import os
+import socket
 from functools import lru_cache
 
 
@@ -7,8 +8,20 @@ class Settings:
     pp_default: str = os.getenv("PROCESSOR_DEFAULT_URL")
     pp_fallback: str = os.getenv("PROCESSOR_FALLBACK_URL")
     health_cache_ttl: int = 5
+    # Intervalo de leitura do estado de saúde publicado no Redis
+    health_refresh_interval: float = float(os.getenv("HEALTH_REFRESH_INTERVAL", "0.5"))
+    # Default mais lento que fallback * ratio (e acima do piso) perde a preferência
+    health_latency_ratio: float = float(os.getenv("HEALTH_LATENCY_RATIO", "3"))
+    health_slow_ms: int = int(os.getenv("HEALTH_SLOW_MS", "100"))
+    # Teto do limite adaptativo de requisições simultâneas por processor
+    processor_max_concurrency: int = int(os.getenv("PROCESSOR_MAX_CONCURRENCY", "50"))
 
 
 @lru_cache
 def get_settings() -> Settings:
     return Settings()
+
+
+def get_worker_id() -> str:
+    # Calculado sob demanda para que processos filhos tenham o próprio pid
+    return os.getenv("WORKER_ID") or f"{socket.gethostname()}-{os.getpid()}"
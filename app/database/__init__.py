@@ -1,5 +1,11 @@
 from .redis_pool import redis_client
-from .storage import save_payment, get_summary, purge_payments
+from .storage import (
+    save_payment,
+    save_payments,
+    get_summary,
+    purge_payments,
+    migrate_legacy_payments,
+)
 
 
 class Database:
@@ -14,7 +20,18 @@ class Database:
             print(f"Erro ao inicializar database: {e}")
             raise e
 
+    async def migrate(self) -> int:
+        return await migrate_legacy_payments()
+
 
 database = Database()
 
-__all__ = ["database", "redis_client", "save_payment", "get_summary", "purge_payments"]
+__all__ = [
+    "database",
+    "redis_client",
+    "save_payment",
+    "save_payments",
+    "get_summary",
+    "purge_payments",
+    "migrate_legacy_payments",
+]
@@ -0,0 +1,83 @@
+import os
+import time
+from typing import Tuple
+
+from .redis_pool import redis_raw_client
+
+# Estado por correlationId em hashes pequenos (codificação listpack):
+#   idem:{geração}:{shard}  campo = UUID em 16 bytes
+#   valor "c:{ms}" enquanto um worker está com o pagamento, "d" depois de salvo
+# A geração muda a cada IDEMPOTENCY_WINDOW segundos e só a atual e a anterior
+# são consultadas, o que limita a memória ao volume de duas janelas.
+KEY_IDEMPOTENCY = "idem"
+IDEMPOTENCY_WINDOW = int(os.getenv("IDEMPOTENCY_WINDOW", "600"))
+# 256 shards pelo primeiro byte do UUID mantém cada hash abaixo do limite
+# de listpack (128 campos) até ~32 mil pagamentos por janela
+IDEMPOTENCY_SHARDS = 256
+# Claim mais antigo que isso é considerado abandonado (worker caiu)
+IDEMPOTENCY_CLAIM_MS = int(os.getenv("IDEMPOTENCY_CLAIM_MS", "10000"))
+
+CLAIMED = 1
+DONE = 0
+BUSY = 2
+
+# KEYS: geração atual, geração anterior
+# ARGV: campo, agora em ms, validade do claim em ms, TTL das chaves em s
+_CLAIM = """
+local current = redis.call('HGET', KEYS[1], ARGV[1])
+local previous = redis.call('HGET', KEYS[2], ARGV[1])
+if current == 'd' or previous == 'd' then
+    return 0
+end
+local claim = current or previous
+if claim then
+    local claimed_at = tonumber(string.sub(claim, 3))
+    if claimed_at and tonumber(ARGV[2]) - claimed_at < tonumber(ARGV[3]) then
+        return 2
+    end
+end
+redis.call('HSET', KEYS[1], ARGV[1], 'c:' .. ARGV[2])
+redis.call('EXPIRE', KEYS[1], ARGV[4])
+return 1
+"""
+
+# Solta o claim para a próxima tentativa sem apagar um "d"
+_RELEASE = """
+for i = 1, 2 do
+    local state = redis.call('HGET', KEYS[i], ARGV[1])
+    if state and state ~= 'd' then
+        redis.call('HDEL', KEYS[i], ARGV[1])
+    end
+end
+return 1
+"""
+
+_claim = redis_raw_client.register_script(_CLAIM)
+_release = redis_raw_client.register_script(_RELEASE)
+
+
+def idempotency_ttl() -> int:
+    return IDEMPOTENCY_WINDOW * 2
+
+
+def idempotency_keys(raw_id: bytes, now: float) -> Tuple[str, str]:
+    generation = int(now // IDEMPOTENCY_WINDOW)
+    shard = raw_id[0] % IDEMPOTENCY_SHARDS
+    return (
+        f"{KEY_IDEMPOTENCY}:{generation}:{shard}",
+        f"{KEY_IDEMPOTENCY}:{generation - 1}:{shard}",
+    )
+
+
+async def claim_payment(raw_id: bytes) -> int:
+    # CLAIMED: este worker chama o processor; DONE: já salvo, só confirmar;
+    # BUSY: outro worker está com o pagamento agora
+    now = time.time()
+    return await _claim(
+        keys=list(idempotency_keys(raw_id, now)),
+        args=[raw_id, int(now * 1000), IDEMPOTENCY_CLAIM_MS, idempotency_ttl()],
+    )
+
+
+async def release_claim(raw_id: bytes):
+    await _release(keys=list(idempotency_keys(raw_id, time.time())), args=[raw_id])
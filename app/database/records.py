@@ -0,0 +1,164 @@
+import hashlib
+import struct
+import time
+import uuid
+from datetime import datetime
+from typing import Dict, Iterable, List, Tuple
+
+import orjson
+
+# Registro binário v1 usado como membro do sorted set de pagamentos:
+# versão (1 byte) | processor (1 byte) | amount em centavos (uint64) | UUID (16 bytes)
+# O timestamp fica no score do ZSET, então não é repetido no membro.
+RECORD_VERSION = 1
+RECORD_STRUCT = struct.Struct("<BBQ16s")
+RECORD_SIZE = RECORD_STRUCT.size
+
+# Mesmo layout ignorando o UUID: o summary só precisa de processor e centavos
+_SUMMARY_STRUCT = struct.Struct("<BBQ16x")
+
+# Entrada da payment_queue montada uma única vez na API:
+# versão (1 byte) | retry_count (1 byte) | UUID (16 bytes) | centavos (uint64)
+# | requested_at em epoch ms (int64) | corpo JSON pronto para o processor
+ENTRY_VERSION = 1
+ENTRY_HEADER = struct.Struct("<BB16sQq")
+ENTRY_HEADER_SIZE = ENTRY_HEADER.size
+MAX_ENTRY_RETRIES = 255
+
+PROCESSOR_CODES = {"default": 1, "fallback": 2, "error": 3}
+PROCESSOR_NAMES = {code: name for name, code in PROCESSOR_CODES.items()}
+
+
+def to_cents(amount: float) -> int:
+    return int(float(amount) * 100 + 0.5)
+
+
+def correlation_id_bytes(cid: str) -> bytes:
+    try:
+        return uuid.UUID(cid).bytes
+    except (ValueError, TypeError, AttributeError):
+        # correlationId fora do formato UUID: digest estável de 16 bytes
+        return hashlib.md5(str(cid).encode()).digest()
+
+
+def encode_record(cid: str, cents: int, processor: str) -> bytes:
+    return encode_raw_record(correlation_id_bytes(cid), cents, processor)
+
+
+def encode_raw_record(raw_id: bytes, cents: int, processor: str) -> bytes:
+    return RECORD_STRUCT.pack(RECORD_VERSION, PROCESSOR_CODES[processor], cents, raw_id)
+
+
+def decode_record(member: bytes) -> Dict:
+    version, code, cents, raw_id = RECORD_STRUCT.unpack(member)
+    return {
+        "version": version,
+        "processor": PROCESSOR_NAMES.get(code, "unknown"),
+        "cents": cents,
+        "correlationId": str(uuid.UUID(bytes=raw_id)),
+    }
+
+
+def format_requested_at(requested_ms: int) -> str:
+    seconds, millis = divmod(requested_ms, 1000)
+    return time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(seconds)) + f".{millis:03d}Z"
+
+
+def build_entry(
+    cid: str, amount: float, requested_ms: int, retry_count: int = 0
+) -> bytes:
+    body = orjson.dumps(
+        {
+            "correlationId": cid,
+            "amount": amount,
+            "requestedAt": format_requested_at(requested_ms),
+        }
+    )
+    header = ENTRY_HEADER.pack(
+        ENTRY_VERSION,
+        retry_count,
+        correlation_id_bytes(cid),
+        to_cents(amount),
+        requested_ms,
+    )
+    return header + body
+
+
+def decode_entry(entry: bytes) -> Tuple[int, bytes, int, int, bytes]:
+    # (retry_count, UUID, centavos, requested_at ms, corpo do processor)
+    if entry[:1] == b"{":
+        entry = legacy_to_entry(entry)
+    version, retry_count, raw_id, cents, requested_ms = ENTRY_HEADER.unpack_from(entry)
+    if version != ENTRY_VERSION:
+        raise ValueError(f"versão de entrada desconhecida: {version}")
+    return retry_count, raw_id, cents, requested_ms, entry[ENTRY_HEADER_SIZE:]
+
+
+def with_retry_count(entry: bytes, retry_count: int) -> bytes:
+    if entry[:1] == b"{":
+        entry = legacy_to_entry(entry)
+    return entry[:1] + bytes((min(retry_count, MAX_ENTRY_RETRIES),)) + entry[2:]
+
+
+def legacy_to_entry(entry: bytes) -> bytes:
+    # Entradas JSON enfileiradas por versões anteriores da API
+    payment = orjson.loads(entry)
+    requested_at = payment["requested_at"]
+    if isinstance(requested_at, str):
+        requested_ms = int(
+            datetime.fromisoformat(requested_at.replace("Z", "+00:00")).timestamp()
+            * 1000
+        )
+    else:
+        requested_ms = int(float(requested_at) * 1000)
+    return build_entry(
+        payment["correlationId"],
+        payment["amount"],
+        requested_ms,
+        min(payment.get("retry_count", 0), MAX_ENTRY_RETRIES),
+    )
+
+
+def is_legacy_member(member: bytes) -> bool:
+    return member[:1] == b"{"
+
+
+def legacy_to_record(member: bytes) -> bytes:
+    payment = orjson.loads(member)
+    return encode_record(
+        payment["correlationId"],
+        to_cents(payment.get("amount", 0) or 0),
+        payment.get("processor", "default"),
+    )
+
+
+def summarize_records(members: Iterable[bytes]) -> Dict[str, List[int]]:
+    # processor -> [quantidade, centavos]
+    totals = {name: [0, 0] for name in PROCESSOR_CODES}
+    by_code = {code: totals[name] for name, code in PROCESSOR_CODES.items()}
+
+    packed = []
+    for member in members:
+        if len(member) == RECORD_SIZE and member[0] == RECORD_VERSION:
+            packed.append(member)
+            continue
+
+        # Membros JSON legados ainda não migrados
+        if is_legacy_member(member):
+            try:
+                payment = orjson.loads(member)
+            except (ValueError, TypeError, orjson.JSONDecodeError):
+                continue
+            entry = totals.get(payment.get("processor"))
+            if entry is not None:
+                entry[0] += 1
+                entry[1] += to_cents(payment.get("amount", 0) or 0)
+
+    # Registros de largura fixa: um único iter_unpack sobre o buffer concatenado
+    for _, code, cents in _SUMMARY_STRUCT.iter_unpack(b"".join(packed)):
+        entry = by_code.get(code)
+        if entry is not None:
+            entry[0] += 1
+            entry[1] += cents
+
+    return totals
@@ -1,14 +1,33 @@
 import os
 
 from redis.asyncio.client import Redis
-from redis.asyncio.connection import ConnectionPool
+from redis.asyncio.connection import BlockingConnectionPool, ConnectionPool
 
-redis_pool = ConnectionPool(
-    host=os.getenv("REDIS_HOST", "redis"),
-    port=6379,
-    max_connections=100,
-    decode_responses=True,
-    socket_timeout=5,
-)
+from app.memory import MEMORY_BUDGET_MB, redis_pool_size
+
+REDIS_MAX_CONNECTIONS = redis_pool_size(100)
+
+
+def _pool(decode_responses: bool) -> ConnectionPool:
+    options = dict(
+        host=os.getenv("REDIS_HOST", "redis"),
+        port=6379,
+        max_connections=REDIS_MAX_CONNECTIONS,
+        decode_responses=decode_responses,
+        socket_timeout=5,
+    )
+    # Com orçamento de memória o pool é menor: quem não consegue conexão
+    # espera uma liberar em vez de receber "Too many connections"
+    if MEMORY_BUDGET_MB:
+        return BlockingConnectionPool(timeout=5, **options)
+    return ConnectionPool(**options)
+
+
+redis_pool = _pool(decode_responses=True)
 
 redis_client = Redis(connection_pool=redis_pool)
+
+# Pool sem decode para os registros binários de pagamento
+redis_raw_pool = _pool(decode_responses=False)
+
+redis_raw_client = Redis(connection_pool=redis_raw_pool)
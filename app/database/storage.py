@@ -1,68 +1,579 @@
-import orjson
+import math
+import os
+import struct
+import time
 from datetime import datetime
-from typing import Optional
-from functools import lru_cache
+from typing import Optional, Dict, List, Sequence, Tuple
 
-from .redis_pool import redis_client
+from redis.exceptions import ResponseError
 
+from app.metrics import count_error
+
+from .idempotency import KEY_IDEMPOTENCY, idempotency_keys, idempotency_ttl
+from .redis_pool import redis_raw_client
+from .records import (
+    correlation_id_bytes,
+    decode_record,
+    encode_raw_record,
+    is_legacy_member,
+    legacy_to_record,
+    summarize_records,
+    to_cents,
+)
+
+# Pagamentos particionados por intervalo de PARTITION_SECONDS:
+#   payments_by_date:{partição}                      sorted set, score = timestamp
+#   payments_summary:{processor}:{campo}:{partição}  contadores por bucket de
+#       BUCKET_SECONDS (campo count ou cents, índice do bucket como campo do hash)
+#   payments_partitions                              diretório, membro = score = partição
+# Com PAYMENT_RETENTION_SECONDS cada partição expira sozinha, o purge usa UNLINK
+# e, sob allkeys-lru, o Redis despeja partições antigas em vez do histórico todo.
 KEY_SET = "payments_by_date"
+KEY_BUCKETS = "payments_summary"
+KEY_PARTITIONS = "payments_partitions"
+# Contador monotônico incrementado a cada escrita; valida o cache de summary
+KEY_VERSION = "payments_version"
+BUCKET_SECONDS = 1
+PARTITION_SECONDS = int(os.getenv("PAYMENT_PARTITION_SECONDS", "60"))
+# TTL de cada partição desde a última escrita; 0 mantém para sempre. A
+# expiração não incrementa payments_version: o cache de summary só percebe
+# partições expiradas na próxima escrita
+PAYMENT_RETENTION = int(os.getenv("PAYMENT_RETENTION_SECONDS", "0"))
+# Janelas com até este número de partições dispensam a leitura do diretório
+MAX_DIRECT_PARTITIONS = 1440
+SUMMARY_PROCESSORS = ("default", "fallback")
+# Soma do summary feita por script Lua no Redis (só os totais voltam)
+SUMMARY_SCRIPT = os.getenv("SUMMARY_SCRIPT", "1") == "1"
+
+
+def partition_of(timestamp: float) -> int:
+    return int(timestamp // PARTITION_SECONDS)
+
 
+def partition_key(partition: int) -> str:
+    return f"{KEY_SET}:{partition}"
 
-@lru_cache(maxsize=1024)
-def get_cached_timestamp(dt: datetime) -> float:
-    # Converter para UTC timestamp
-    if dt.tzinfo is not None:
-        # Se tem timezone, converter para UTC
-        return dt.timestamp()
-    else:
-        # Se não tem timezone, assumir que é UTC
-        return dt.timestamp()
+
+def bucket_key(processor: str, field: str, partition: int) -> str:
+    return f"{KEY_BUCKETS}:{processor}:{field}:{partition}"
+
+
+def legacy_bucket_key(processor: str, field: str) -> str:
+    # Hashes de bucket de antes do particionamento
+    return f"{KEY_BUCKETS}:{processor}:{field}"
 
 
 async def save_payment(cid: str, amount: float, processor: str, requested_at: datetime):
-    timestamp = get_cached_timestamp(requested_at)
-
-    payment_json = orjson.dumps(
-        {
-            "correlationId": cid,
-            "amount": amount,
-            "processor": processor,
-            "requested_at": timestamp,
-        }
-    ).decode()
+    await save_payments(
+        [
+            (
+                correlation_id_bytes(cid),
+                to_cents(amount),
+                processor,
+                requested_at.timestamp(),
+            )
+        ]
+    )
 
-    await redis_client.zadd(KEY_SET, {payment_json: timestamp})
 
+# Persiste só os pagamentos ainda não marcados como salvos no estado de
+# idempotência, então uma entrada duplicada não infla o summary.
+# KEYS: 1 diretório de partições, 2 versão, depois partições, buckets,
+#       chaves de idempotência e listas de ack, referenciados por índice
+# ARGV: 1 nº de pagamentos, 2 TTL das chaves de idempotência, 3 retenção em
+#       segundos (0 = sem TTL), 4 partição mais antiga mantida no diretório,
+#       então 11 valores por pagamento (membro, score, partição, índices do
+#       sorted set e dos hashes count/cents, bucket, centavos, UUID, índices
+#       das gerações atual e anterior) e os acks (quantidade, depois pares
+#       índice da lista / item)
+_SAVE = """
+local count = tonumber(ARGV[1])
+local retention = tonumber(ARGV[3])
+local pos = 5
+local saved = 0
+local touched = {}
+local partitions = {}
+for i = 1, count do
+    local field = ARGV[pos + 8]
+    local current = tonumber(ARGV[pos + 9])
+    local previous = tonumber(ARGV[pos + 10])
+    if redis.call('HGET', KEYS[current], field) ~= 'd'
+        and redis.call('HGET', KEYS[previous], field) ~= 'd' then
+        redis.call('HSET', KEYS[current], field, 'd')
+        redis.call('EXPIRE', KEYS[current], ARGV[2])
+        local zset = tonumber(ARGV[pos + 3])
+        local counts = tonumber(ARGV[pos + 4])
+        local cents = tonumber(ARGV[pos + 5])
+        redis.call('ZADD', KEYS[zset], ARGV[pos + 1], ARGV[pos])
+        redis.call('HINCRBY', KEYS[counts], ARGV[pos + 6], 1)
+        redis.call('HINCRBY', KEYS[cents], ARGV[pos + 6], ARGV[pos + 7])
+        touched[zset] = true
+        touched[counts] = true
+        touched[cents] = true
+        partitions[ARGV[pos + 2]] = true
+        saved = saved + 1
+    end
+    pos = pos + 11
+end
+for partition in pairs(partitions) do
+    redis.call('ZADD', KEYS[1], partition, partition)
+end
+if retention > 0 then
+    for index in pairs(touched) do
+        redis.call('EXPIRE', KEYS[index], retention)
+    end
+    redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', '(' .. ARGV[4])
+end
+if saved > 0 then
+    redis.call('INCR', KEYS[2])
+end
+local acks = tonumber(ARGV[pos])
+pos = pos + 1
+for i = 1, acks do
+    redis.call('LREM', KEYS[tonumber(ARGV[pos])], 1, ARGV[pos + 1])
+    pos = pos + 2
+end
+return saved
+"""
 
-async def get_summary(
-    ts_from: Optional[datetime] = None, ts_to: Optional[datetime] = None
+_save = redis_raw_client.register_script(_SAVE)
+
+BUCKET_PROCESSORS = (*SUMMARY_PROCESSORS, "error")
+
+
+async def save_payments(
+    payments: Sequence[Tuple[bytes, int, str, float]],
+    acks: Sequence[Tuple[str, bytes]] = (),
+) -> int:
+    # payments são tuplas (UUID em bytes, centavos, processor, timestamp em segundos).
+    # acks são pares (lista, item) removidos no mesmo script, confirmando
+    # o consumo da fila somente depois que o pagamento foi persistido.
+    # Retorna quantos pagamentos eram novos.
+    if not payments and not acks:
+        return 0
+
+    keys = [KEY_PARTITIONS, KEY_VERSION]
+    key_index: Dict[str, int] = {}
+
+    def index_of(key: str) -> int:
+        # Índices 1-based do Lua
+        index = key_index.get(key)
+        if index is None:
+            keys.append(key)
+            index = key_index[key] = len(keys)
+        return index
+
+    now = time.time()
+    args: List = [
+        len(payments),
+        idempotency_ttl(),
+        PAYMENT_RETENTION,
+        # Relativo ao pagamento mais recente do lote, como o TTL das partições
+        partition_of(max((p[3] for p in payments), default=now) - PAYMENT_RETENTION),
+    ]
+    for raw_id, cents, processor, timestamp in payments:
+        current, previous = idempotency_keys(raw_id, now)
+        partition = partition_of(timestamp)
+        args.extend(
+            (
+                encode_raw_record(raw_id, cents, processor),
+                timestamp,
+                partition,
+                index_of(partition_key(partition)),
+                index_of(bucket_key(processor, "count", partition)),
+                index_of(bucket_key(processor, "cents", partition)),
+                int(timestamp // BUCKET_SECONDS),
+                cents,
+                raw_id,
+                index_of(current),
+                index_of(previous),
+            )
+        )
+
+    args.append(len(acks))
+    for key, item in acks:
+        args.extend((index_of(key), item))
+
+    return await _save(keys=keys, args=args)
+
+
+def _empty_totals() -> Dict[str, Dict[str, int]]:
+    return {
+        processor: {"totalRequests": 0, "totalCents": 0}
+        for processor in SUMMARY_PROCESSORS
+    }
+
+
+def _sum_buckets(
+    totals: Dict[str, int],
+    counts: Dict[bytes, bytes],
+    cents: Dict[bytes, bytes],
+    first: Optional[int],
+    last: Optional[int],
 ):
-    min_score = ts_from.timestamp() if ts_from else "-inf"
-    max_score = ts_to.timestamp() if ts_to else "+inf"
+    # Soma apenas buckets completos: first <= bucket < last
+    for field, count in counts.items():
+        bucket = int(field)
+        if first is not None and bucket < first:
+            continue
+        if last is not None and bucket >= last:
+            continue
+        totals["totalRequests"] += int(count)
+        totals["totalCents"] += int(cents.get(field, 0))
+
+
+def _sum_members(summary: Dict[str, Dict[str, int]], members: List[bytes]):
+    for processor, (count, cents) in summarize_records(members).items():
+        totals = summary.get(processor)
+        if totals is None:
+            continue
+
+        totals["totalRequests"] += count
+        totals["totalCents"] += cents
+
+
+# Mesmo cálculo do _scan_summary feito dentro do Redis: soma os buckets
+# completos das partições, decodifica os registros binários das bordas e
+# devolve só [count, centavos] de default e fallback. Membros JSON legados
+# abortam o script e o summary cai para o caminho em Python.
+# KEYS: sorted sets das partições das bordas, depois count/cents de default
+#       e de fallback de cada partição da janela
+# ARGV: ts_from, ts_to (ou -inf/+inf), primeiro e último bucket ('' = aberto),
+#       BUCKET_SECONDS, índices dos sorted sets de ts_from e ts_to (0 = sem
+#       borda), índice da primeira chave de bucket
+_SUMMARY = """
+local totals = {0, 0, 0, 0}
+local first = tonumber(ARGV[3])
+local last = tonumber(ARGV[4])
+local lower = tonumber(ARGV[6])
+local upper = tonumber(ARGV[7])
+
+local function add_members(members)
+    for _, member in ipairs(members) do
+        if #member ~= 26 or string.byte(member, 1) ~= 1 then
+            return false
+        end
+        local code = string.byte(member, 2)
+        if code == 1 or code == 2 then
+            local cents = 0
+            for i = 10, 3, -1 do
+                cents = cents * 256 + string.byte(member, i)
+            end
+            totals[code * 2 - 1] = totals[code * 2 - 1] + 1
+            totals[code * 2] = totals[code * 2] + cents
+        end
+    end
+    return true
+end
+
+local function add_buckets(offset, count_key, cents_key)
+    local counts = redis.call('HGETALL', count_key)
+    local cents = redis.call('HGETALL', cents_key)
+    local cents_by_bucket = {}
+    for i = 1, #cents, 2 do
+        cents_by_bucket[cents[i]] = cents[i + 1]
+    end
+    for i = 1, #counts, 2 do
+        local bucket = tonumber(counts[i])
+        if (not first or bucket >= first) and (not last or bucket < last) then
+            totals[offset] = totals[offset] + tonumber(counts[i + 1])
+            totals[offset + 1] = totals[offset + 1] + tonumber(cents_by_bucket[counts[i]] or 0)
+        end
+    end
+end
+
+local ranges = {}
+if first and last and first >= last then
+    ranges[1] = {lower, ARGV[1], ARGV[2]}
+    if upper ~= lower then
+        ranges[2] = {upper, ARGV[1], ARGV[2]}
+    end
+else
+    for i = tonumber(ARGV[8]), #KEYS, 4 do
+        add_buckets(1, KEYS[i], KEYS[i + 1])
+        add_buckets(3, KEYS[i + 2], KEYS[i + 3])
+    end
+    if first and tonumber(ARGV[1]) < first * ARGV[5] then
+        ranges[#ranges + 1] = {lower, ARGV[1], '(' .. (first * ARGV[5])}
+    end
+    if last then
+        ranges[#ranges + 1] = {upper, last * ARGV[5], ARGV[2]}
+    end
+end
+
+for _, range in ipairs(ranges) do
+    if not add_members(redis.call('ZRANGEBYSCORE', KEYS[range[1]], range[2], range[3])) then
+        return redis.error_reply('legacy member in range')
+    end
+end
+return totals
+"""
+
+_summary = redis_raw_client.register_script(_SUMMARY)
+
 
-    payments = await redis_client.zrangebyscore(KEY_SET, min_score, max_score)
+def _bucket_bounds(
+    ts_from: Optional[float], ts_to: Optional[float]
+) -> Tuple[Optional[int], Optional[int]]:
+    # Buckets completos dentro de [ts_from, ts_to]; as bordas parciais
+    # são lidas do sorted set
+    first = None if ts_from is None else math.ceil(ts_from / BUCKET_SECONDS)
+    last = None if ts_to is None else math.floor(ts_to / BUCKET_SECONDS)
+    return first, last
 
-    summary = {
-        "default": {"totalRequests": 0, "totalAmount": 0.0},
-        "fallback": {"totalRequests": 0, "totalAmount": 0.0},
+
+async def _partitions(ts_from: Optional[float], ts_to: Optional[float]) -> List[int]:
+    # Janelas limitadas calculam as partições direto, sem depender do
+    # diretório; janelas abertas ou muito longas consultam o diretório
+    if ts_from is not None and ts_to is not None:
+        first, last = partition_of(ts_from), partition_of(ts_to)
+        if last - first < MAX_DIRECT_PARTITIONS:
+            return list(range(first, last + 1))
+
+    partitions = await redis_raw_client.zrangebyscore(
+        KEY_PARTITIONS,
+        "-inf" if ts_from is None else partition_of(ts_from),
+        "+inf" if ts_to is None else partition_of(ts_to),
+    )
+    return [int(partition) for partition in partitions]
+
+
+def _edge_keys(
+    ts_from: Optional[float], ts_to: Optional[float]
+) -> Tuple[Optional[str], Optional[str]]:
+    # Bordas parciais nunca atravessam partições: PARTITION_SECONDS é
+    # múltiplo de BUCKET_SECONDS
+    return (
+        None if ts_from is None else partition_key(partition_of(ts_from)),
+        None if ts_to is None else partition_key(partition_of(ts_to)),
+    )
+
+
+async def get_summary(
+    ts_from: Optional[float] = None, ts_to: Optional[float] = None
+) -> Dict[str, Dict[str, int]]:
+    if ts_from is not None and ts_to is not None and ts_to < ts_from:
+        return _empty_totals()
+    if SUMMARY_SCRIPT:
+        try:
+            return await _script_summary(ts_from, ts_to)
+        except ResponseError:
+            # Script indisponível ou membros legados no intervalo
+            count_error("summary_script")
+    return await _scan_summary(ts_from, ts_to)
+
+
+async def _script_summary(
+    ts_from: Optional[float], ts_to: Optional[float]
+) -> Dict[str, Dict[str, int]]:
+    first, last = _bucket_bounds(ts_from, ts_to)
+    lower, upper = _edge_keys(ts_from, ts_to)
+
+    keys = [key for key in dict.fromkeys((lower, upper)) if key is not None]
+    lower_index = 0 if lower is None else keys.index(lower) + 1
+    upper_index = 0 if upper is None else keys.index(upper) + 1
+    bucket_start = len(keys) + 1
+    for partition in await _partitions(ts_from, ts_to):
+        for processor in SUMMARY_PROCESSORS:
+            keys.append(bucket_key(processor, "count", partition))
+            keys.append(bucket_key(processor, "cents", partition))
+
+    totals = await _summary(
+        keys=keys,
+        args=[
+            "-inf" if ts_from is None else ts_from,
+            "+inf" if ts_to is None else ts_to,
+            "" if first is None else first,
+            "" if last is None else last,
+            BUCKET_SECONDS,
+            lower_index,
+            upper_index,
+            bucket_start,
+        ],
+    )
+    return {
+        processor: {
+            "totalRequests": int(totals[2 * i]),
+            "totalCents": int(totals[2 * i + 1]),
+        }
+        for i, processor in enumerate(SUMMARY_PROCESSORS)
     }
 
-    for payment_json in payments:
-        p = orjson.loads(payment_json)
-        processor = p["processor"]
-        amount = p["amount"]
 
-        if processor not in summary:
-            summary[processor] = {"totalRequests": 0, "totalAmount": 0.0}
+async def _scan_summary(
+    ts_from: Optional[float], ts_to: Optional[float]
+) -> Dict[str, Dict[str, int]]:
+    summary = _empty_totals()
+    first, last = _bucket_bounds(ts_from, ts_to)
+    lower, upper = _edge_keys(ts_from, ts_to)
+
+    pipe = redis_raw_client.pipeline(transaction=True)
+
+    if first is not None and last is not None and first >= last:
+        # Janela menor que um bucket: varre somente os membros do intervalo,
+        # em no máximo duas partições
+        for key in {lower, upper}:
+            pipe.zrangebyscore(key, ts_from, ts_to)
+        for members in await pipe.execute():
+            _sum_members(summary, members)
+        return summary
+
+    partitions = await _partitions(ts_from, ts_to)
+    for partition in partitions:
+        for processor in SUMMARY_PROCESSORS:
+            pipe.hgetall(bucket_key(processor, "count", partition))
+            pipe.hgetall(bucket_key(processor, "cents", partition))
+
+    if ts_from is not None and ts_from < first * BUCKET_SECONDS:
+        pipe.zrangebyscore(lower, ts_from, f"({first * BUCKET_SECONDS}")
+    if ts_to is not None:
+        pipe.zrangebyscore(upper, last * BUCKET_SECONDS, ts_to)
+
+    results = await pipe.execute()
 
-        summary[processor]["totalRequests"] += 1
-        summary[processor]["totalAmount"] += amount
+    per_partition = 2 * len(SUMMARY_PROCESSORS)
+    for offset in range(0, len(partitions) * per_partition, per_partition):
+        for i, processor in enumerate(SUMMARY_PROCESSORS):
+            _sum_buckets(
+                summary[processor],
+                results[offset + 2 * i],
+                results[offset + 2 * i + 1],
+                first,
+                last,
+            )
 
-    for key in summary:
-        summary[key]["totalAmount"] = round(summary[key]["totalAmount"], 1)
+    for members in results[len(partitions) * per_partition :]:
+        _sum_members(summary, members)
 
     return summary
 
 
+# Move um lote da chave antiga para as partições: só quem remove o membro
+# (ZREM devolve 1) grava e conta nos buckets, então migrações simultâneas ou
+# repetidas não contam o mesmo pagamento duas vezes.
+# KEYS: 1 sorted set antigo, 2 diretório, depois partições e buckets
+# ARGV: 1 retenção em segundos (0 = sem TTL), então 9 valores por membro
+#       (membro antigo, registro binário, score, partição, índices do sorted
+#       set e dos hashes count/cents, bucket, centavos); índice 0 só remove
+#       membros que não podem ser migrados
+_MIGRATE = """
+local retention = tonumber(ARGV[1])
+local moved = 0
+local touched = {}
+for pos = 2, #ARGV, 9 do
+    local zset = tonumber(ARGV[pos + 4])
+    if redis.call('ZREM', KEYS[1], ARGV[pos]) == 1 and zset > 0 then
+        local counts = tonumber(ARGV[pos + 5])
+        local cents = tonumber(ARGV[pos + 6])
+        redis.call('ZADD', KEYS[zset], ARGV[pos + 2], ARGV[pos + 1])
+        redis.call('HINCRBY', KEYS[counts], ARGV[pos + 7], 1)
+        redis.call('HINCRBY', KEYS[cents], ARGV[pos + 7], ARGV[pos + 8])
+        redis.call('ZADD', KEYS[2], ARGV[pos + 3], ARGV[pos + 3])
+        touched[zset] = true
+        touched[counts] = true
+        touched[cents] = true
+        moved = moved + 1
+    end
+end
+if retention > 0 then
+    for index in pairs(touched) do
+        redis.call('EXPIRE', KEYS[index], retention)
+    end
+end
+return moved
+"""
+
+_migrate = redis_raw_client.register_script(_MIGRATE)
+
+
+async def _migrate_batch(entries: List[Tuple[bytes, float]]) -> int:
+    keys = [KEY_SET, KEY_PARTITIONS]
+    key_index: Dict[str, int] = {}
+
+    def index_of(key: str) -> int:
+        index = key_index.get(key)
+        if index is None:
+            keys.append(key)
+            index = key_index[key] = len(keys)
+        return index
+
+    args: List = [PAYMENT_RETENTION]
+    for member, score in entries:
+        try:
+            record = legacy_to_record(member) if is_legacy_member(member) else member
+            decoded = decode_record(record)
+        except (ValueError, TypeError, KeyError, struct.error):
+            decoded = None
+        if decoded is None or decoded["processor"] not in BUCKET_PROCESSORS:
+            args.extend((member, b"", score, 0, 0, 0, 0, 0, 0))
+            continue
+
+        processor = decoded["processor"]
+        partition = partition_of(score)
+        args.extend(
+            (
+                member,
+                record,
+                score,
+                partition,
+                index_of(partition_key(partition)),
+                index_of(bucket_key(processor, "count", partition)),
+                index_of(bucket_key(processor, "cents", partition)),
+                int(score // BUCKET_SECONDS),
+                decoded["cents"],
+            )
+        )
+    return await _migrate(keys=keys, args=args)
+
+
+async def migrate_legacy_payments(batch_size: int = 1000) -> int:
+    # Move o sorted set único de antes do particionamento para as partições,
+    # reconstruindo os buckets a partir dos registros (membros JSON legados
+    # são convertidos para o formato binário)
+    migrated = 0
+
+    while True:
+        entries = await redis_raw_client.zrange(
+            KEY_SET, 0, batch_size - 1, withscores=True
+        )
+        if not entries:
+            break
+        migrated += await _migrate_batch(entries)
+
+    # Os buckets antigos foram reconstruídos por partição
+    await redis_raw_client.unlink(
+        *(
+            legacy_bucket_key(processor, field)
+            for processor in BUCKET_PROCESSORS
+            for field in ("count", "cents")
+        )
+    )
+    return migrated
+
+
+async def get_version() -> int:
+    return int(await redis_raw_client.get(KEY_VERSION) or 0)
+
+
+async def _unlink_matching(pattern: str, batch_size: int = 500):
+    # SCAN + UNLINK em lotes: o Redis libera a memória em background e
+    # nenhum comando bloqueia por muito tempo
+    batch = []
+    async for key in redis_raw_client.scan_iter(pattern, count=1000):
+        batch.append(key)
+        if len(batch) >= batch_size:
+            await redis_raw_client.unlink(*batch)
+            batch = []
+    if batch:
+        await redis_raw_client.unlink(*batch)
+
+
 async def purge_payments():
-    await redis_client.delete(KEY_SET)
+    await redis_raw_client.unlink(KEY_SET, KEY_PARTITIONS)
+    await _unlink_matching(f"{KEY_SET}:*")
+    await _unlink_matching(f"{KEY_BUCKETS}:*")
+    # A versão é incrementada, nunca apagada, para invalidar caches existentes
+    await redis_raw_client.incr(KEY_VERSION)
+
+    # Estado de idempotência: poucas centenas de hashes pequenos por geração
+    await _unlink_matching(f"{KEY_IDEMPOTENCY}:*")
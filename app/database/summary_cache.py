@@ -0,0 +1,55 @@
+import os
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from .storage import get_summary, get_version
+
+SUMMARY_CACHE_SIZE = int(os.getenv("SUMMARY_CACHE_SIZE", "256"))
+
+SummaryKey = Tuple[Optional[float], Optional[float]]
+
+
+class SummaryCache:
+    # LRU de summaries por janela (from, to), válidos enquanto a versão de
+    # escrita no Redis não mudar
+    def __init__(self, max_entries: int = SUMMARY_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[SummaryKey, Tuple[int, Dict]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: SummaryKey, version: int) -> Optional[Dict]:
+        cached = self._entries.get(key)
+        if cached is None or cached[0] != version:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return cached[1]
+
+    def put(self, key: SummaryKey, version: int, summary: Dict):
+        self._entries[key] = (version, summary)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+
+summary_cache = SummaryCache()
+
+
+async def get_cached_summary(
+    ts_from: Optional[float] = None, ts_to: Optional[float] = None
+) -> Dict:
+    # A versão é lida antes do summary: uma escrita concorrente no máximo
+    # força um recálculo na próxima consulta, nunca serve dado velho
+    version = await get_version()
+    key = (ts_from, ts_to)
+
+    summary = summary_cache.get(key, version)
+    if summary is None:
+        summary = await get_summary(ts_from, ts_to)
+        summary_cache.put(key, version, summary)
+    return summary
@@ -0,0 +1,74 @@
+from urllib.parse import parse_qsl
+
+import orjson
+
+from app.routes.payments import enqueue_payment, payments_summary
+
+# Mensagens de início de resposta montadas uma vez; o servidor só as lê
+_EMPTY_START = {
+    status: {
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-length", b"0")],
+    }
+    for status in (201, 503)
+}
+_EMPTY_BODY = {"type": "http.response.body", "body": b""}
+_JSON_TYPE = (b"content-type", b"application/json")
+_TEXT_TYPE = (b"content-type", b"text/plain; charset=utf-8")
+
+
+async def read_body(receive) -> bytes:
+    message = await receive()
+    body = message.get("body", b"")
+    if not message.get("more_body", False):
+        return body
+
+    chunks = [body]
+    while message.get("more_body", False):
+        message = await receive()
+        chunks.append(message.get("body", b""))
+    return b"".join(chunks)
+
+
+async def send_body(send, status: int, content_type, body: bytes):
+    await send(
+        {
+            "type": "http.response.start",
+            "status": status,
+            "headers": [content_type, (b"content-length", b"%d" % len(body))],
+        }
+    )
+    await send({"type": "http.response.body", "body": body})
+
+
+class FastPathApp:
+    # Atende POST /payments e GET /payments-summary direto na interface ASGI;
+    # qualquer outra rota, método ou evento (lifespan) segue para o Starlette
+    def __init__(self, fallback):
+        self.fallback = fallback
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            path = scope["path"]
+            method = scope["method"]
+            if path == "/payments" and method == "POST":
+                await self.create_payment(receive, send)
+                return
+            if path == "/payments-summary" and method == "GET":
+                await self.get_summary(scope, send)
+                return
+        await self.fallback(scope, receive, send)
+
+    async def create_payment(self, receive, send):
+        status, content = await enqueue_payment(await read_body(receive))
+        if content or status not in _EMPTY_START:
+            await send_body(send, status, _TEXT_TYPE, content)
+            return
+        await send(_EMPTY_START[status])
+        await send(_EMPTY_BODY)
+
+    async def get_summary(self, scope, send):
+        params = dict(parse_qsl(scope["query_string"].decode("latin-1")))
+        content = await payments_summary(params.get("from"), params.get("to"))
+        await send_body(send, 200, _JSON_TYPE, orjson.dumps(content))
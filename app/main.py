@@ -1,4 +1,8 @@
 import asyncio
+import contextlib
+import os
+import socket
+
 import uvicorn
 from starlette.applications import Starlette
 
@@ -6,6 +10,12 @@ from starlette.applications import Starlette
 from .routes.healthcheck import router as health_router
 from .routes.payments import router as payments_router
 from .routes.purge import router as purge_router
+from .routes.metrics import api_metrics_source, router as metrics_router
+from .metrics import publish_metrics
+from .backpressure import ingest_queue
+from .capture import traffic_capture
+from .memory import freeze_heap, install_report_signal, log_memory, tune_gc
+from .fastpath import FastPathApp
 
 
 # Combinar todas as rotas
@@ -13,37 +23,143 @@ all_routes = [
     *health_router,
     *payments_router,
     *purge_router,
+    *metrics_router,
 ]
 
-app = Starlette(routes=all_routes)
 
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    tune_gc()
+    install_report_signal(asyncio.get_running_loop())
+    freeze_heap()
+    log_memory("inicialização")
 
-async def main():
-    print("Starting server...")
+    # Cada processo da API publica as próprias métricas para o /metrics agregado
+    tasks = [asyncio.create_task(publish_metrics(api_metrics_source()))]
+    # Sem tráfego a captura ainda vai para o disco a cada CAPTURE_FLUSH_MS
+    if traffic_capture is not None:
+        tasks.append(asyncio.create_task(traffic_capture.run_flusher()))
+    try:
+        yield
+    finally:
+        for task in tasks:
+            task.cancel()
+        # Pagamentos no buffer de coalescência e no de overflow vão para a
+        # fila antes de sair
+        await ingest_queue.drain()
+        if traffic_capture is not None:
+            traffic_capture.close()
 
-    from .database import database
 
-    try:
-        await database.initialize()
-    except Exception as e:
-        print(f"Storage não inicializado: {e}")
+starlette_app = Starlette(routes=all_routes, lifespan=lifespan)
+
+# POST /payments e GET /payments-summary direto em ASGI; o resto via Starlette
+ASGI_FAST_PATH = os.getenv("ASGI_FAST_PATH", "1") == "1"
+app = FastPathApp(starlette_app) if ASGI_FAST_PATH else starlette_app
+
+APP_PORT = 9999
+# "tcp" (processo único na 9999), "uds" (um socket Unix por processo) ou
+# "reuseport" (vários processos na 9999 com SO_REUSEPORT)
+APP_SERVE_MODE = os.getenv("APP_SERVE_MODE", "tcp")
+APP_PROCESSES = int(os.getenv("APP_PROCESSES", "1"))
+# Diretório compartilhado com o HAProxy; o processo i escuta em app{i + 1}.sock
+APP_UDS_DIR = os.getenv("APP_UDS_DIR", "/sockets")
 
-    config = uvicorn.Config(
+
+def build_config() -> uvicorn.Config:
+    return uvicorn.Config(
         "app.main:app",
         host="0.0.0.0",
-        port=9999,
+        port=APP_PORT,
         reload=False,
         loop="uvloop",
         http="httptools",
         workers=1,
         log_level="info",
     )
-    server = uvicorn.Server(config)
+
+
+async def initialize_storage():
+    from .database import database
+
+    try:
+        await database.initialize()
+    except Exception as e:
+        print(f"Storage não inicializado: {e}")
+
+    try:
+        migrated = await database.migrate()
+        if migrated:
+            print(f"{migrated} pagamentos migrados para o formato binário")
+    except Exception as e:
+        print(f"Migração de pagamentos falhou: {e}")
+
+
+def tcp_socket(reuse_port: bool = False) -> socket.socket:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if reuse_port:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind(("0.0.0.0", APP_PORT))
+    sock.set_inheritable(True)
+    return sock
+
+
+def uds_socket(path: str) -> socket.socket:
+    # Socket de uma execução anterior impede o bind
+    if os.path.exists(path):
+        os.unlink(path)
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.bind(path)
+    # O HAProxy roda com outro usuário no volume compartilhado
+    os.chmod(path, 0o666)
+    return sock
+
+
+def serve_process(index: int):
+    if APP_SERVE_MODE == "reuseport":
+        sockets = [tcp_socket(reuse_port=True)]
+    else:
+        sockets = [uds_socket(os.path.join(APP_UDS_DIR, f"app{index + 1}.sock"))]
+        # O primeiro processo mantém a 9999 para o healthcheck do container
+        if index == 0:
+            sockets.append(tcp_socket())
+
+    server = uvicorn.Server(build_config())
+    server.run(sockets=sockets)
+
+
+async def main():
+    print("Starting server...")
+
+    await initialize_storage()
+
+    server = uvicorn.Server(build_config())
     print("Server configured, starting...")
     await server.serve()
 
 
-if __name__ == "__main__":
-    import asyncio
+def run():
+    if APP_SERVE_MODE == "tcp":
+        asyncio.run(main())
+        return
+
+    from .database.redis_pool import redis_pool, redis_raw_pool
+    from .supervisor import supervise
 
-    asyncio.run(main())
+    async def prepare():
+        print("Starting server...")
+        await initialize_storage()
+        # Conexões abertas aqui não podem ser herdadas pelos filhos
+        await redis_pool.disconnect()
+        await redis_raw_pool.disconnect()
+
+    asyncio.run(prepare())
+    print(
+        f"Server configured, starting {APP_PROCESSES} processos ({APP_SERVE_MODE})..."
+    )
+    supervise(serve_process, APP_PROCESSES, "api")
+
+
+if __name__ == "__main__":
+    run()
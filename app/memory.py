@@ -0,0 +1,106 @@
+import gc
+import os
+import signal
+import sys
+from collections import Counter
+from typing import Dict
+
+# Orçamento de memória do processo em MB (limite do container dividido pelos
+# processos); 0 mantém os tamanhos padrão dos pools
+MEMORY_BUDGET_MB = int(os.getenv("MEMORY_BUDGET_MB", "0"))
+# Parte do orçamento que fica com o interpretador, módulos importados e filas
+MEMORY_BASELINE_MB = int(os.getenv("MEMORY_BASELINE_MB", "32"))
+# Custo aproximado de cada conexão aberta: buffers do parser mais os buffers
+# do socket, que o kernel conta no cgroup do container
+REDIS_CONNECTION_KB = 160
+HTTP_CONNECTION_KB = 160
+# Fatia do que sobra do orçamento para os dois pools Redis; o resto é HTTP
+REDIS_SHARE = 0.4
+MIN_POOL_SIZE = 4
+# gen0,gen1,gen2 do coletor; vazio mantém o padrão do Python
+GC_THRESHOLDS = os.getenv("GC_THRESHOLDS", "5000,20,20" if MEMORY_BUDGET_MB else "")
+# Congela os objetos vivos depois do warmup (módulos, pools, scripts)
+GC_FREEZE = os.getenv("GC_FREEZE", "1" if MEMORY_BUDGET_MB else "0") == "1"
+
+_PROC_STATUS_FIELDS = {
+    "VmRSS": "rss_kb",
+    "VmHWM": "peak_rss_kb",
+    "RssAnon": "anon_kb",
+    "RssFile": "file_kb",
+    "RssShmem": "shmem_kb",
+}
+
+
+def _pool_size(default: int, connection_kb: int, share: float) -> int:
+    if not MEMORY_BUDGET_MB:
+        return default
+    available_kb = max(0, MEMORY_BUDGET_MB - MEMORY_BASELINE_MB) * 1024 * share
+    return max(MIN_POOL_SIZE, min(default, int(available_kb // connection_kb)))
+
+
+def redis_pool_size(default: int) -> int:
+    # Por pool: são dois (com e sem decode)
+    return _pool_size(default, REDIS_CONNECTION_KB, REDIS_SHARE / 2)
+
+
+def http_pool_size(default: int) -> int:
+    return _pool_size(default, HTTP_CONNECTION_KB, 1 - REDIS_SHARE)
+
+
+def tune_gc():
+    if GC_THRESHOLDS:
+        gc.set_threshold(*(int(value) for value in GC_THRESHOLDS.split(",")))
+
+
+def freeze_heap():
+    # Objetos congelados saem das coletas seguintes; depois de um fork os
+    # filhos também deixam de tocar (e copiar) essas páginas
+    if GC_FREEZE:
+        gc.collect()
+        gc.freeze()
+
+
+def rss_kb() -> int:
+    return process_memory().get("rss_kb", 0)
+
+
+def process_memory() -> Dict[str, int]:
+    # /proc só existe no Linux; fora dele o relatório sai vazio
+    memory = {}
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                name, _, value = line.partition(":")
+                field = _PROC_STATUS_FIELDS.get(name)
+                if field:
+                    memory[field] = int(value.split()[0])
+    except OSError:
+        pass
+    return memory
+
+
+def memory_report(top_types: int = 5) -> Dict:
+    # Depois do freeze_heap só aparecem os objetos criados desde o warmup,
+    # o que destaca o que está crescendo
+    objects = gc.get_objects()
+    return {
+        **process_memory(),
+        "budget_mb": MEMORY_BUDGET_MB,
+        "python_blocks": sys.getallocatedblocks(),
+        "gc_tracked": len(objects),
+        "gc_frozen": gc.get_freeze_count(),
+        "gc_counts": gc.get_count(),
+        "gc_thresholds": gc.get_threshold(),
+        "top_types": Counter(type(obj).__name__ for obj in objects).most_common(
+            top_types
+        ),
+    }
+
+
+def log_memory(where: str):
+    print(f"Memória ({where}): {memory_report()}")
+
+
+def install_report_signal(loop):
+    # kill -USR1 <pid> imprime o relatório sob demanda
+    loop.add_signal_handler(signal.SIGUSR1, log_memory, "SIGUSR1")
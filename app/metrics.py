@@ -0,0 +1,221 @@
+import asyncio
+import os
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import orjson
+
+from app.memory import rss_kb
+
+# Buckets log-lineares no estilo HDR: 4 sub-buckets por potência de 2,
+# de 0.125 ms a 65 s. Registrar custa um bisect e três somas.
+BUCKET_BOUNDS: List[float] = [
+    2.0**exp * (1 + sub / 4) for exp in range(-3, 16) for sub in range(4)
+] + [2.0**16]
+
+METRICS_KEY = "metrics:source:{}"
+METRICS_SOURCES_KEY = "metrics:sources"
+METRICS_PUBLISH_INTERVAL = float(os.getenv("METRICS_PUBLISH_INTERVAL", "1"))
+
+METRIC_HELP = {
+    "ingest_latency_ms": "Tempo do POST /payments até a resposta (com INGEST_ACK=buffer, até entrar no lote coalescido)",
+    "queue_dwell_ms": "Tempo entre requested_at e o início do processamento",
+    "processor_rtt_ms": "Duração das chamadas aos processors",
+    "redis_op_ms": "Latência das operações Redis",
+    "processor_calls_total": "Chamadas aos processors por resultado",
+    "payments_total": "Pagamentos concluídos por processor",
+    "fallback_total": "Pagamentos que caíram no fallback",
+    "retries_total": "Pagamentos reagendados",
+    "give_ups_total": "Pagamentos que esgotaram as tentativas",
+    "duplicates_total": "Entradas descartadas por correlationId já salvo",
+    "routing_holds_total": "Pagamentos segurados pela estratégia de roteamento",
+    "claims_busy_total": "Entradas adiadas por correlationId em processamento em outro worker",
+    "errors_total": "Exceções tratadas por ponto de captura",
+    "queue_depth": "Tamanho da payment_queue (LLEN no momento da coleta)",
+    "queue_depth_observed": "Tamanho da payment_queue visto pela API (retorno do RPUSH e LLEN)",
+    "queue_shed_total": "Pagamentos recusados com 503 por fila cheia",
+    "queue_spilled_total": "Pagamentos guardados no buffer local por fila cheia",
+    "queue_delayed_total": "Pagamentos atrasados até a fila baixar",
+    "spill_buffer": "Pagamentos no buffer local aguardando a fila baixar",
+    "ingest_batch_size": "Pagamentos por RPUSH coalescido na API",
+    "process_rss_kb": "Memória residente somada dos processos (VmRSS)",
+    "processor_concurrency_limit": "Limite AIMD de chamadas simultâneas por processor, somado dos workers",
+    "processor_in_flight": "Chamadas em andamento por processor",
+    "processor_waiting": "Chamadas aguardando vaga no limiter por processor",
+}
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    __slots__ = ("counts", "total", "count")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKET_BOUNDS) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def record(self, value: float):
+        self.counts[bisect_left(BUCKET_BOUNDS, value)] += 1
+        self.total += value
+        self.count += 1
+
+    def merge(self, counts: List[int], total: float, count: int):
+        for i, value in enumerate(counts):
+            self.counts[i] += value
+        self.total += total
+        self.count += count
+
+
+class Metrics:
+    def __init__(self):
+        self.histograms: Dict[Tuple[str, Labels], Histogram] = {}
+        self.counters: Dict[Tuple[str, Labels], float] = {}
+        self.gauges: Dict[Tuple[str, Labels], float] = {}
+
+    def histogram(self, name: str, **labels: str) -> Histogram:
+        # Chamadores quentes guardam o Histogram retornado e chamam record()
+        key = (name, tuple(sorted(labels.items())))
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = Histogram()
+        return histogram
+
+    def observe(self, name: str, value: float, **labels: str):
+        self.histogram(name, **labels).record(value)
+
+    def inc(self, name: str, amount: float = 1, **labels: str):
+        key = (name, tuple(sorted(labels.items())))
+        self.counters[key] = self.counters.get(key, 0) + amount
+
+    def set_gauge(self, name: str, value: float, **labels: str):
+        self.gauges[(name, tuple(sorted(labels.items())))] = value
+
+    def snapshot(self) -> Dict:
+        return {
+            "h": [
+                [name, labels, h.counts, h.total, h.count]
+                for (name, labels), h in self.histograms.items()
+            ],
+            "c": [
+                [name, labels, value] for (name, labels), value in self.counters.items()
+            ],
+            "g": [
+                [name, labels, value] for (name, labels), value in self.gauges.items()
+            ],
+        }
+
+    def merge(self, snapshot: Dict):
+        for name, labels, counts, total, count in snapshot["h"]:
+            self.histogram(name, **dict(labels)).merge(counts, total, count)
+        for name, labels, value in snapshot["c"]:
+            self.inc(name, value, **dict(labels))
+        # Gauges de processos diferentes são somados (ex.: buffers locais)
+        for name, labels, value in snapshot.get("g", ()):
+            key = (name, tuple(sorted(dict(labels).items())))
+            self.gauges[key] = self.gauges.get(key, 0) + value
+
+
+metrics = Metrics()
+
+
+def count_error(where: str):
+    metrics.inc("errors_total", where=where)
+
+
+def _format_labels(labels: Iterable[Tuple[str, str]]) -> str:
+    return ",".join(f'{key}="{value}"' for key, value in labels)
+
+
+def render(merged: Metrics) -> str:
+    # Formato texto do Prometheus (0.0.4)
+    lines: List[str] = []
+    described = set()
+
+    def describe(name: str, kind: str):
+        if name not in described:
+            described.add(name)
+            lines.append(f"# HELP {name} {METRIC_HELP.get(name, name)}")
+            lines.append(f"# TYPE {name} {kind}")
+
+    for (name, labels), value in sorted(merged.counters.items()):
+        describe(name, "counter")
+        label_text = _format_labels(labels)
+        lines.append(
+            f"{name}{{{label_text}}} {value:g}" if label_text else f"{name} {value:g}"
+        )
+
+    for (name, labels), value in sorted(merged.gauges.items()):
+        describe(name, "gauge")
+        label_text = _format_labels(labels)
+        lines.append(
+            f"{name}{{{label_text}}} {value:g}" if label_text else f"{name} {value:g}"
+        )
+
+    for (name, labels), histogram in sorted(
+        merged.histograms.items(), key=lambda item: item[0]
+    ):
+        describe(name, "histogram")
+        prefix = _format_labels(labels)
+        prefix = prefix + "," if prefix else ""
+        cumulative = 0
+        for bound, value in zip(BUCKET_BOUNDS, histogram.counts):
+            cumulative += value
+            lines.append(f'{name}_bucket{{{prefix}le="{bound:g}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{prefix}le="+Inf"}} {histogram.count}')
+        suffix = f"{{{prefix[:-1]}}}" if prefix else ""
+        lines.append(f"{name}_sum{suffix} {histogram.total:.3f}")
+        lines.append(f"{name}_count{suffix} {histogram.count}")
+
+    return "\n".join(lines) + "\n"
+
+
+async def publish_metrics(
+    source: str,
+    interval: float = METRICS_PUBLISH_INTERVAL,
+    refresh: Optional[Callable[[], None]] = None,
+):
+    # Cada processo publica o próprio snapshot; quem lê soma todos. refresh
+    # atualiza gauges de estado do processo logo antes de cada publicação
+    from app.database.redis_pool import redis_raw_client
+
+    key = METRICS_KEY.format(source)
+    while True:
+        await asyncio.sleep(interval)
+        metrics.set_gauge("process_rss_kb", rss_kb())
+        if refresh is not None:
+            refresh()
+        try:
+            pipe = redis_raw_client.pipeline(transaction=False)
+            pipe.set(key, orjson.dumps(metrics.snapshot()), px=int(interval * 5000))
+            pipe.sadd(METRICS_SOURCES_KEY, source)
+            await pipe.execute()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            count_error("metrics_publish")
+
+
+async def collect_metrics(local_source: Optional[str] = None) -> Metrics:
+    from app.database.redis_pool import redis_raw_client
+
+    merged = Metrics()
+    merged.merge(metrics.snapshot())
+
+    sources = [
+        member.decode()
+        for member in await redis_raw_client.smembers(METRICS_SOURCES_KEY)
+        if member.decode() != local_source
+    ]
+    if sources:
+        values = await redis_raw_client.mget([METRICS_KEY.format(s) for s in sources])
+        expired = []
+        for source, value in zip(sources, values):
+            if value is None:
+                expired.append(source)
+            else:
+                merged.merge(orjson.loads(value))
+        if expired:
+            await redis_raw_client.srem(METRICS_SOURCES_KEY, *expired)
+
+    return merged
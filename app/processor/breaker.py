@@ -0,0 +1,143 @@
+import asyncio
+import os
+from collections import deque
+from typing import Dict
+
+from app.database.redis_pool import redis_client
+from app.metrics import count_error
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Janela local de resultados usada para decidir a abertura
+BREAKER_WINDOW = int(os.getenv("BREAKER_WINDOW", "20"))
+BREAKER_MIN_CALLS = int(os.getenv("BREAKER_MIN_CALLS", "10"))
+BREAKER_ERROR_RATE = float(os.getenv("BREAKER_ERROR_RATE", "0.5"))
+# Chamadas acima deste tempo contam como falha
+BREAKER_SLOW_MS = float(os.getenv("BREAKER_SLOW_MS", "1500"))
+# Tempo aberto antes de liberar probes
+BREAKER_OPEN_MS = int(os.getenv("BREAKER_OPEN_MS", "2000"))
+# Probes simultâneos (em todos os workers) e sucessos necessários para fechar
+BREAKER_PROBES = int(os.getenv("BREAKER_PROBES", "2"))
+# Um probe que não reportou resultado libera a vaga após este tempo
+BREAKER_PROBE_TTL_MS = int(os.getenv("BREAKER_PROBE_TTL_MS", "7000"))
+BREAKER_REFRESH_INTERVAL = float(os.getenv("BREAKER_REFRESH_INTERVAL", "0.2"))
+
+
+class CircuitBreaker:
+    # Estado compartilhado no Redis:
+    #   breaker:{name}:open      existe enquanto o circuito está aberto (PX)
+    #   breaker:{name}:half_open existe do trip até o fechamento
+    #   breaker:{name}:probes / :successes contadores do half-open
+    def __init__(self, name: str):
+        self.name = name
+        self.state = CLOSED
+        self._window = deque(maxlen=BREAKER_WINDOW)
+        self._open_key = f"breaker:{name}:open"
+        self._half_open_key = f"breaker:{name}:half_open"
+        self._probes_key = f"breaker:{name}:probes"
+        self._successes_key = f"breaker:{name}:successes"
+
+    async def allow(self) -> bool:
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN:
+            return False
+
+        # Half-open: só alguns probes passam, contados entre todos os workers
+        try:
+            pipe = redis_client.pipeline(transaction=True)
+            pipe.incr(self._probes_key)
+            pipe.pexpire(self._probes_key, BREAKER_PROBE_TTL_MS, nx=True)
+            probes, _ = await pipe.execute()
+        except Exception:
+            count_error("breaker_probe")
+            return False
+        return probes <= BREAKER_PROBES
+
+    async def record(self, ok: bool, elapsed_ms: float):
+        # Falha ao publicar o estado não pode derrubar o processamento do pagamento
+        try:
+            await self._record(ok, elapsed_ms)
+        except Exception:
+            count_error("breaker_record")
+
+    async def _record(self, ok: bool, elapsed_ms: float):
+        failed = not ok or elapsed_ms > BREAKER_SLOW_MS
+
+        if self.state == HALF_OPEN:
+            if failed:
+                await self.trip()
+                return
+            successes = await redis_client.incr(self._successes_key)
+            if successes >= BREAKER_PROBES:
+                await self.close()
+            return
+
+        if self.state == OPEN:
+            return
+
+        self._window.append(failed)
+        if len(self._window) < BREAKER_MIN_CALLS:
+            return
+        if sum(self._window) / len(self._window) >= BREAKER_ERROR_RATE:
+            await self.trip()
+
+    async def trip(self):
+        pipe = redis_client.pipeline(transaction=True)
+        pipe.set(self._open_key, 1, px=BREAKER_OPEN_MS)
+        pipe.set(self._half_open_key, 1, px=BREAKER_OPEN_MS * 30)
+        pipe.delete(self._probes_key, self._successes_key)
+        await pipe.execute()
+        self.state = OPEN
+        self._window.clear()
+
+    async def close(self):
+        await redis_client.delete(
+            self._half_open_key, self._probes_key, self._successes_key
+        )
+        self.state = CLOSED
+        self._window.clear()
+
+    def queue_refresh(self, pipe):
+        pipe.exists(self._open_key)
+        pipe.exists(self._half_open_key)
+
+    def apply_refresh(self, is_open: int, is_half_open: int):
+        if is_open:
+            state = OPEN
+        elif is_half_open:
+            state = HALF_OPEN
+        else:
+            state = CLOSED
+
+        if state != self.state:
+            self._window.clear()
+        self.state = state
+
+
+breakers: Dict[str, CircuitBreaker] = {
+    name: CircuitBreaker(name) for name in ("default", "fallback")
+}
+
+
+def get_breaker(processor_type: str) -> CircuitBreaker:
+    return breakers[processor_type]
+
+
+async def refresh_breakers():
+    # Sincroniza o estado local com o que os outros workers publicaram
+    while True:
+        try:
+            pipe = redis_client.pipeline(transaction=False)
+            for breaker in breakers.values():
+                breaker.queue_refresh(pipe)
+            results = await pipe.execute()
+            for i, breaker in enumerate(breakers.values()):
+                breaker.apply_refresh(results[2 * i], results[2 * i + 1])
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            count_error("breaker_refresh")
+        await asyncio.sleep(BREAKER_REFRESH_INTERVAL)
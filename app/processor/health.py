@@ -0,0 +1,93 @@
+import asyncio
+import time
+from typing import Dict, Optional
+
+import orjson
+
+from app.config import get_settings, get_worker_id
+from app.database.redis_pool import redis_client
+from app.metrics import count_error
+from app.processor.processor import get_payment_processor_health
+
+PROCESSORS = ("default", "fallback")
+
+HEALTH_LEADER_KEY = "health:leader"
+# Trava global: no máximo uma chamada ao service-health por janela,
+# mesmo durante a troca de líder
+HEALTH_POLL_LOCK_KEY = "health:poll"
+HEALTH_STATE_KEY = "health:state:{}"
+
+# Renova o lock do líder apenas se ele ainda pertencer a este worker
+_RENEW_LEADER = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+# Último estado lido do Redis, compartilhado por todas as corrotinas do worker
+_health_state: Dict[str, Optional[Dict]] = {name: None for name in PROCESSORS}
+
+
+def get_health_states() -> Dict[str, Optional[Dict]]:
+    return _health_state
+
+
+async def _acquire_leadership(worker_id: str, ttl_ms: int) -> bool:
+    if await redis_client.set(HEALTH_LEADER_KEY, worker_id, nx=True, px=ttl_ms):
+        return True
+    return bool(
+        await redis_client.eval(_RENEW_LEADER, 1, HEALTH_LEADER_KEY, worker_id, ttl_ms)
+    )
+
+
+async def _poll_processors(interval: float):
+    interval_ms = int(interval * 1000)
+    if not await redis_client.set(HEALTH_POLL_LOCK_KEY, 1, nx=True, px=interval_ms):
+        return
+
+    results = await asyncio.gather(
+        *(get_payment_processor_health(name) for name in PROCESSORS)
+    )
+
+    pipe = redis_client.pipeline(transaction=False)
+    for name, health in zip(PROCESSORS, results):
+        if health is None:
+            continue
+        state = {
+            "failing": bool(health.get("failing")),
+            "minResponseTime": int(health.get("minResponseTime") or 0),
+            "checkedAt": int(time.time() * 1000),
+        }
+        pipe.set(HEALTH_STATE_KEY.format(name), orjson.dumps(state), px=interval_ms * 3)
+    await pipe.execute()
+
+
+async def run_health_monitor():
+    # Um único líder entre os workers consulta os processors a cada janela
+    interval = get_settings().health_cache_ttl
+    worker_id = get_worker_id()
+    ttl_ms = int(interval * 2000)
+
+    while True:
+        try:
+            if await _acquire_leadership(worker_id, ttl_ms):
+                await _poll_processors(interval)
+        except Exception:
+            count_error("health_monitor")
+        await asyncio.sleep(interval)
+
+
+async def refresh_health_state():
+    # Todos os workers leem o estado publicado pelo líder
+    interval = get_settings().health_refresh_interval
+    keys = [HEALTH_STATE_KEY.format(name) for name in PROCESSORS]
+
+    while True:
+        try:
+            values = await redis_client.mget(keys)
+            for name, value in zip(PROCESSORS, values):
+                _health_state[name] = orjson.loads(value) if value else None
+        except Exception:
+            count_error("health_refresh")
+        await asyncio.sleep(interval)
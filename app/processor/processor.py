@@ -1,8 +1,9 @@
 import os
+import orjson
 
 from typing import Optional, Dict, Any
 
-from app.client.session import get_httpx_client
+from app.client.session import get_transport
 
 
 def get_processor_url(processor_type: str, endpoint: str = "payments") -> str:
@@ -17,45 +18,39 @@ def get_processor_url(processor_type: str, endpoint: str = "payments") -> str:
 
 
 async def process_payment_in_processor(
-    payload: Dict[str, Any],
+    body: bytes,
     processor_type: str = "default",
     timeout: Optional[float] = 6.0,  # Timeout adequado para o fallback com 5s de delay
 ) -> str:
     try:
-        client = await get_httpx_client()
+        transport = await get_transport()
         processor_url = get_processor_url(processor_type)
 
-        processor_payload = {
-            "correlationId": payload["correlationId"],
-            "amount": payload["amount"],
-            "requestedAt": payload["requested_at"],
-        }
-        response = await client.post(
-            processor_url, json=processor_payload, timeout=timeout
-        )
+        # Corpo montado uma única vez na API e repassado sem alteração
+        status, content = await transport.post(processor_url, body, timeout=timeout)
 
-        if response.status_code == 422:
+        if status == 422:
             return "not avaiable"
 
-        if response.status_code != 200:
-            response.raise_for_status()
+        if not 200 <= status < 300:
+            raise RuntimeError(f"processor {processor_type} respondeu {status}")
 
-        return response.text
+        return content.decode()
     except Exception as e:
         raise e
 
 
 async def get_payment_processor_health(
     processor_type: str = "default", timeout: Optional[float] = 1.5
-) -> bool:
+) -> Optional[Dict[str, Any]]:
+    # Retorna {"failing": bool, "minResponseTime": int} ou None (erro / 429)
     try:
-        client = await get_httpx_client()
+        transport = await get_transport()
         health_url = get_processor_url(processor_type, "health")
 
-        response = await client.get(health_url)
-        return response.status_code == 200
+        status, content = await transport.get(health_url, timeout=timeout)
+        if status != 200:
+            return None
+        return orjson.loads(content)
     except Exception:
-        return False
-
-
-
+        return None
@@ -0,0 +1,145 @@
+import os
+from typing import Callable, Dict, List, Optional, Protocol
+
+from app.config import get_settings
+from app.utils import DEFAULT_FEE, FALLBACK_FEE
+
+# Estratégia de roteamento dos workers (nome em STRATEGIES)
+ROUTING_STRATEGY = os.getenv("ROUTING_STRATEGY", "health")
+# Idade máxima de um pagamento segurado à espera do default antes de ir
+# para o fallback
+ROUTING_DEADLINE_MS = float(os.getenv("ROUTING_DEADLINE_MS", "1500"))
+# Espera de cada pagamento segurado antes de ser roteado de novo
+ROUTING_HOLD_MS = float(os.getenv("ROUTING_HOLD_MS", "200"))
+# Custo de latência no roteamento por custo: fração do valor por segundo de RTT
+ROUTING_LATENCY_COST = float(os.getenv("ROUTING_LATENCY_COST", "0.1"))
+
+FEES = {"default": DEFAULT_FEE, "fallback": FALLBACK_FEE}
+
+# Estado de saúde por processor no formato publicado pelo líder
+# ({"failing", "minResponseTime", "checkedAt"}); None = ainda desconhecido
+HealthStates = Dict[str, Optional[Dict]]
+
+
+def _is_up(state: Optional[Dict]) -> bool:
+    return not (state and state.get("failing"))
+
+
+def _latency_ms(state: Optional[Dict]) -> float:
+    return float(state.get("minResponseTime", 0)) if state else 0.0
+
+
+class RoutingStrategy(Protocol):
+    # Devolve a ordem de tentativa do pagamento; lista vazia segura o
+    # pagamento por ROUTING_HOLD_MS e roteia de novo. Só depende do estado de
+    # saúde e da idade do pagamento, então o simulador (benchmarks.routing_sim)
+    # usa as mesmas classes dos workers.
+    name: str
+
+    def route(self, states: HealthStates, age_ms: float) -> List[str]: ...
+
+
+class AlwaysDefault:
+    # Só o default; falhas viram retentativas com backoff, nunca taxa de fallback
+    name = "default"
+
+    def route(self, states: HealthStates, age_ms: float) -> List[str]:
+        return ["default"]
+
+
+class HealthWeighted:
+    # Ordem pelo estado publicado: pula processors falhando e inverte a
+    # ordem quando o default fica muito mais lento que o fallback
+    name = "health"
+
+    def __init__(
+        self, slow_ms: Optional[float] = None, latency_ratio: Optional[float] = None
+    ):
+        settings = get_settings()
+        self.slow_ms = settings.health_slow_ms if slow_ms is None else slow_ms
+        self.latency_ratio = (
+            settings.health_latency_ratio if latency_ratio is None else latency_ratio
+        )
+
+    def route(self, states: HealthStates, age_ms: float) -> List[str]:
+        default = states.get("default")
+        fallback = states.get("fallback")
+        default_up = _is_up(default)
+        fallback_up = _is_up(fallback)
+
+        if default_up and fallback_up:
+            if default and fallback:
+                default_ms = _latency_ms(default)
+                if (
+                    default_ms > self.slow_ms
+                    and default_ms > _latency_ms(fallback) * self.latency_ratio
+                ):
+                    return ["fallback", "default"]
+            return ["default", "fallback"]
+
+        if default_up:
+            return ["default"]
+
+        if fallback_up:
+            return ["fallback"]
+
+        # Ambos marcados como falhando: o estado pode estar atrasado, tenta na ordem padrão
+        return ["default", "fallback"]
+
+
+class DeadlineHold:
+    # Segura o pagamento enquanto o default está falhando ou lento, até
+    # deadline_ms de idade; depois disso vale a ordem por saúde
+    name = "deadline"
+
+    def __init__(self, deadline_ms: float = ROUTING_DEADLINE_MS):
+        self.deadline_ms = deadline_ms
+        self.health = HealthWeighted()
+
+    def route(self, states: HealthStates, age_ms: float) -> List[str]:
+        order = self.health.route(states, age_ms)
+        if order[0] == "default":
+            return ["default"]
+        if age_ms < self.deadline_ms:
+            return []
+        return order
+
+
+class CostMinimizing:
+    # Valor esperado por pagamento: (1 - taxa) menos o custo do RTT anunciado;
+    # processors falhando ficam de fora e, com os dois fora, segura até o deadline
+    name = "cost"
+
+    def __init__(
+        self,
+        latency_cost: float = ROUTING_LATENCY_COST,
+        deadline_ms: float = ROUTING_DEADLINE_MS,
+    ):
+        self.latency_cost = latency_cost
+        self.deadline_ms = deadline_ms
+
+    def value(self, processor: str, state: Optional[Dict]) -> float:
+        return 1 - FEES[processor] - self.latency_cost * _latency_ms(state) / 1000
+
+    def route(self, states: HealthStates, age_ms: float) -> List[str]:
+        up = [name for name in FEES if _is_up(states.get(name))]
+        if not up:
+            return [] if age_ms < self.deadline_ms else list(FEES)
+        return sorted(up, key=lambda name: -self.value(name, states.get(name)))
+
+
+STRATEGIES: Dict[str, Callable[[], RoutingStrategy]] = {
+    AlwaysDefault.name: AlwaysDefault,
+    HealthWeighted.name: HealthWeighted,
+    DeadlineHold.name: DeadlineHold,
+    CostMinimizing.name: CostMinimizing,
+}
+
+
+def get_strategy(name: str = ROUTING_STRATEGY) -> RoutingStrategy:
+    try:
+        return STRATEGIES[name]()
+    except KeyError:
+        raise ValueError(
+            f"ROUTING_STRATEGY desconhecida: {name} (opções: {', '.join(STRATEGIES)})"
+        ) from None
@@ -0,0 +1,28 @@
+from starlette.requests import Request
+from starlette.routing import Route
+from starlette.responses import PlainTextResponse
+
+from app.backpressure import QUEUE_KEY
+from app.config import get_worker_id
+from app.database.redis_pool import redis_client
+from app.metrics import collect_metrics, count_error, render, metrics
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def api_metrics_source() -> str:
+    return f"api:{get_worker_id()}"
+
+
+async def metrics_endpoint(request: Request) -> PlainTextResponse:
+    try:
+        merged = await collect_metrics(api_metrics_source())
+        merged.set_gauge("queue_depth", await redis_client.llen(QUEUE_KEY))
+    except Exception:
+        # Sem Redis ainda dá para expor as métricas deste processo
+        count_error("metrics_collect")
+        merged = metrics
+    return PlainTextResponse(render(merged), media_type=PROMETHEUS_CONTENT_TYPE)
+
+
+router = [Route("/metrics", metrics_endpoint, methods=["GET"])]
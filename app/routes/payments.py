@@ -1,100 +1,117 @@
 import asyncio
+import time
+from typing import Any, Dict, Optional, Tuple
+
 import orjson
-from datetime import datetime, timezone
 from starlette.requests import Request
 from starlette.routing import Route
 from starlette.responses import JSONResponse, Response
 from starlette.exceptions import HTTPException
-from app.database.redis_pool import redis_client
-from app.database.storage import KEY_SET
+from app.backpressure import ingest_queue
+from app.capture import traffic_capture
+from app.database.records import build_entry
+from app.database.summary_cache import get_cached_summary
+from app.metrics import count_error, metrics
 from app.utils import (
     iso_to_timestamp,
-    get_redis_range,
     REDIS_TIMEOUT,
     calculate_summary,
 )
 
+INGEST_LATENCY = metrics.histogram("ingest_latency_ms")
+SUMMARY_LATENCY = metrics.histogram("redis_op_ms", op="summary")
 
-async def create_payment(request: Request) -> Response:
-    try:
-        body = await request.body()
 
+async def enqueue_payment(body: bytes) -> Tuple[int, bytes]:
+    # Núcleo do POST /payments, compartilhado com o fast path ASGI
+    start = time.perf_counter()
+    if traffic_capture is not None:
+        traffic_capture.record(body)
+    try:
         if not body:
             raise HTTPException(status_code=400, detail="Bad request")
 
         payment_data = orjson.loads(body)
 
-        # Adicionar timestamp original da requisição
-        current_time = datetime.now(timezone.utc)
-        payment_data["requested_at"] = current_time.isoformat()
+        # Entrada da fila montada uma única vez: cabeçalho binário com o que
+        # o worker persiste + corpo pronto para o processor, com o timestamp
+        # original da requisição
+        entry = build_entry(
+            payment_data["correlationId"],
+            payment_data["amount"],
+            int(time.time() * 1000),
+        )
 
-        # Colocar na fila Redis com timestamp preservado
-        await redis_client.rpush("payment_queue", orjson.dumps(payment_data))
+        # Acima da marca alta da fila a política de overflow decide (503,
+        # buffer local ou espera)
+        status = await ingest_queue.push(entry)
 
-        return Response(status_code=201)
+        INGEST_LATENCY.record((time.perf_counter() - start) * 1000)
+        return status, b""
     except Exception as e:
+        count_error("ingest")
         if "OOM" in str(e) or "memory" in str(e).lower():
-            return Response(status_code=503)
-        return Response(status_code=500, content=str(e))
+            return 503, b""
+        return 500, str(e).encode()
 
 
-async def get_payment(request: Request) -> JSONResponse:
+async def payments_summary(
+    from_request: Optional[str], to_request: Optional[str]
+) -> Dict[str, Any]:
+    # Núcleo do GET /payments-summary, compartilhado com o fast path ASGI
     try:
-        from_request = request.query_params.get("from")
-        to_request = request.query_params.get("to")
-
-        min_score = "-inf"
-        max_score = "+inf"
+        ts_from = None
+        ts_to = None
 
         if from_request:
             timestamp, success = iso_to_timestamp(from_request)
             if success and timestamp is not None:
-                min_score = timestamp
+                ts_from = float(timestamp)
 
         if to_request:
             timestamp, success = iso_to_timestamp(to_request)
             if success and timestamp is not None:
-                max_score = timestamp
+                ts_to = float(timestamp)
 
-        # Buscar todos os pagamentos na chave KEY_SET
-        all_payments_task = asyncio.create_task(
-            get_redis_range(KEY_SET, min_score, max_score)
+        # Summary pré-agregado por bucket; apenas as bordas varrem o sorted set.
+        # Consultas repetidas sem escritas novas custam um GET da versão.
+        start = time.perf_counter()
+        summary = await asyncio.wait_for(
+            get_cached_summary(ts_from, ts_to), timeout=REDIS_TIMEOUT
         )
-
-        try:
-            all_payments = await asyncio.wait_for(
-                all_payments_task, timeout=REDIS_TIMEOUT
-            )
-        except asyncio.TimeoutError:
-            all_payments = []
+        SUMMARY_LATENCY.record((time.perf_counter() - start) * 1000)
 
     except Exception:
-        all_payments = []
-
-    default_items = []
-    fallback_items = []
-
-    for payment in all_payments:
-        try:
-            payment_data = orjson.loads(payment)
-            processor = payment_data.get("processor", "default")
-            if processor == "default":
-                default_items.append(payment)
-            elif processor == "fallback":
-                fallback_items.append(payment)
-        except (ValueError, TypeError, orjson.JSONDecodeError):
-            continue
-
-    default_summary = await calculate_summary(default_items, "default")
-    fallback_summary = await calculate_summary(fallback_items, "fallback")
-
-    return JSONResponse(
-        status_code=200,
-        content={
-            "default": default_summary,
-            "fallback": fallback_summary,
-        },
+        count_error("summary")
+        summary = {}
+
+    default_totals = summary.get("default", {})
+    fallback_totals = summary.get("fallback", {})
+
+    return {
+        "default": calculate_summary(
+            default_totals.get("totalRequests", 0),
+            default_totals.get("totalCents", 0),
+            "default",
+        ),
+        "fallback": calculate_summary(
+            fallback_totals.get("totalRequests", 0),
+            fallback_totals.get("totalCents", 0),
+            "fallback",
+        ),
+    }
+
+
+async def create_payment(request: Request) -> Response:
+    status, content = await enqueue_payment(await request.body())
+    return Response(status_code=status, content=content or None)
+
+
+async def get_payment(request: Request) -> JSONResponse:
+    content = await payments_summary(
+        request.query_params.get("from"), request.query_params.get("to")
     )
+    return JSONResponse(status_code=200, content=content)
 
 
 router = [
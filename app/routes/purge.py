@@ -1,13 +1,14 @@
 from starlette.exceptions import HTTPException
+from starlette.requests import Request
 from starlette.responses import JSONResponse
 from starlette.routing import Route
 
-from app.database.redis_pool import redis_client
+from app.database.storage import purge_payments as purge_storage
 
 
-async def purge_payments() -> JSONResponse:
+async def purge_payments(request: Request) -> JSONResponse:
     try:
-        await redis_client.delete("default", "fallback")
+        await purge_storage()
 
         return JSONResponse(status_code=200, content="Database purged")
 
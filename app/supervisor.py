@@ -0,0 +1,61 @@
+import multiprocessing
+import os
+import signal
+import time
+from typing import Callable, Dict
+
+# Intervalo mínimo entre reinícios do mesmo filho (evita loop de crash)
+RESTART_BACKOFF = 1.0
+
+
+def supervise(
+    target: Callable[[int], None],
+    processes: int,
+    name: str,
+    shutdown_timeout: float = 10.0,
+):
+    # Mantém `processes` filhos rodando target(index); reinicia os que morrem e,
+    # em SIGTERM/SIGINT, repassa SIGTERM e espera até shutdown_timeout.
+    ctx = multiprocessing.get_context("fork")
+    children: Dict[int, multiprocessing.Process] = {}
+    started_at: Dict[int, float] = {}
+    stopping = False
+
+    def start(index: int):
+        process = ctx.Process(target=target, args=(index,), name=f"{name}-{index}")
+        process.start()
+        children[index] = process
+        started_at[index] = time.monotonic()
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    for index in range(processes):
+        start(index)
+    print(f"{name}: {processes} processos iniciados (pid {os.getpid()})")
+
+    while not stopping:
+        time.sleep(0.2)
+        for index, process in list(children.items()):
+            if process.is_alive() or stopping:
+                continue
+            print(f"{name}-{index} terminou com código {process.exitcode}, reiniciando")
+            wait = RESTART_BACKOFF - (time.monotonic() - started_at[index])
+            if wait > 0:
+                time.sleep(wait)
+            start(index)
+
+    for process in children.values():
+        if process.is_alive():
+            os.kill(process.pid, signal.SIGTERM)
+
+    deadline = time.monotonic() + shutdown_timeout
+    for process in children.values():
+        process.join(max(0.0, deadline - time.monotonic()))
+        if process.is_alive():
+            process.kill()
+            process.join()
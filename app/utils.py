@@ -1,10 +1,8 @@
 import re
 import math
 import calendar
-import orjson
-from typing import Optional, Tuple, List, Dict, Any
+from typing import Optional, Tuple, Dict, Any
 from datetime import datetime
-from app.database.redis_pool import redis_client
 
 ISO_DATE_PATTERN = re.compile(
     r"(\d{4})-(\d{2})-(\d{2})T(\d{2}):(\d{2}):(\d{2})(?:\.(\d{3}))?"
@@ -98,43 +96,15 @@ def is_valid_iso_date(date_string: str) -> bool:
     return bool(ISO_DATE_PATTERN.match(date_string))
 
 
-async def get_redis_range(key: str, min_score: str, max_score: str) -> List[bytes]:
-    try:
-        return await redis_client.zrangebyscore(key, min=min_score, max=max_score)
-    except Exception:
-        return []
-
-
-async def calculate_summary(
-    items: List[bytes], transaction_type: str
+def calculate_summary(
+    total_requests: int, total_cents: int, transaction_type: str
 ) -> Dict[str, Any]:
-    total_amount = 0.0
-    transaction_count = 0
-
-    for item in items:
-        if not item:
-            continue
-
-        try:
-            if isinstance(item, (bytes, bytearray)):
-                json_string = item.decode("utf-8")
-            else:
-                json_string = str(item)
-
-            transaction = orjson.loads(json_string)
-            amount = float(transaction.get("amount", 0) or 0)
-
-            total_amount += amount
-            transaction_count += 1
-
-        except (ValueError, TypeError, orjson.JSONDecodeError):
-            continue
-
     fee_rate = DEFAULT_FEE if transaction_type == "default" else FALLBACK_FEE
+    total_amount = total_cents / 100.0
     total_fee = total_amount * fee_rate
 
     return {
-        "totalRequests": transaction_count,
+        "totalRequests": total_requests,
         "totalAmount": round_to_cents(total_amount),
         "totalFee": round_to_cents(total_fee),
         "feePerTransaction": fee_rate,
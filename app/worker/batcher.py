@@ -0,0 +1,128 @@
+import asyncio
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+
+from app.database.storage import save_payments
+from app.metrics import count_error, metrics
+
+# Flush ao atingir WRITE_BATCH_SIZE pagamentos ou WRITE_BATCH_MS desde o primeiro pendente
+WRITE_BATCH_SIZE = int(os.getenv("WRITE_BATCH_SIZE", "50"))
+WRITE_BATCH_MS = float(os.getenv("WRITE_BATCH_MS", "5"))
+
+FLUSH_LATENCY = metrics.histogram("redis_op_ms", op="save_batch")
+
+
+class PaymentBatcher:
+    def __init__(
+        self, max_items: int = WRITE_BATCH_SIZE, max_delay_ms: float = WRITE_BATCH_MS
+    ):
+        self.max_items = max_items
+        self.max_delay = max_delay_ms / 1000
+        self._pending: List[Tuple[bytes, int, str, float]] = []
+        self._acks: List[Tuple[str, bytes]] = []
+        self._has_items = asyncio.Event()
+        self._full = asyncio.Event()
+        self._lock = asyncio.Lock()
+        self._stopping = asyncio.Event()
+        self._stopped = asyncio.Event()
+        self._running = False
+
+        self.flushes = 0
+        self.flushed_items = 0
+        self.failed_flushes = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+
+    def add(
+        self,
+        raw_id: bytes,
+        cents: int,
+        processor: str,
+        timestamp: float,
+        ack: Optional[Tuple[str, bytes]] = None,
+    ):
+        self._pending.append((raw_id, cents, processor, timestamp))
+        if ack is not None:
+            self._acks.append(ack)
+        self._has_items.set()
+        if len(self._pending) >= self.max_items:
+            self._full.set()
+
+    async def flush(self):
+        async with self._lock:
+            if not self._pending:
+                return
+
+            batch, acks = self._pending, self._acks
+            self._pending, self._acks = [], []
+            self._full.clear()
+
+            start = time.perf_counter()
+            try:
+                saved = await save_payments(batch, acks)
+            except BaseException:
+                # Devolve o lote para a próxima tentativa em vez de perder os
+                # pagamentos, inclusive se a tarefa for cancelada no meio do flush
+                self._pending = batch + self._pending
+                self._acks = acks + self._acks
+                self._has_items.set()
+                self.failed_flushes += 1
+                raise
+
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            FLUSH_LATENCY.record(elapsed_ms)
+            if saved < len(batch):
+                # Já salvos por outra entrada com o mesmo correlationId
+                metrics.inc("duplicates_total", len(batch) - saved)
+            self.flushes += 1
+            self.flushed_items += len(batch)
+            self.last_flush_ms = elapsed_ms
+            self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+
+    async def run(self):
+        self._running = True
+        try:
+            while not self._stopping.is_set():
+                await self._has_items.wait()
+                self._has_items.clear()
+
+                # Espera completar o lote ou estourar o prazo
+                try:
+                    await asyncio.wait_for(self._full.wait(), timeout=self.max_delay)
+                except asyncio.TimeoutError:
+                    pass
+
+                try:
+                    await self.flush()
+                except Exception:
+                    count_error("flush")
+                    await asyncio.sleep(self.max_delay)
+        finally:
+            self._running = False
+            self._stopped.set()
+
+    async def stop(self):
+        # Shutdown: o run() termina o flush em andamento e sai, sem ser
+        # cancelado no meio de um lote; o restante fica para o flush final
+        self._stopping.set()
+        self._has_items.set()
+        self._full.set()
+        if self._running:
+            await self._stopped.wait()
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "batch_size": self.max_items,
+            "batch_ms": self.max_delay * 1000,
+            "pending": len(self._pending),
+            "flushes": self.flushes,
+            "flushed_items": self.flushed_items,
+            "failed_flushes": self.failed_flushes,
+            "avg_batch": self.flushed_items / self.flushes if self.flushes else 0.0,
+            "last_flush_ms": self.last_flush_ms,
+            "max_flush_ms": self.max_flush_ms,
+        }
+
+
+payment_batcher = PaymentBatcher()
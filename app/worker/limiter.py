@@ -0,0 +1,107 @@
+import asyncio
+import os
+from collections import deque
+from typing import Dict
+
+from app.config import get_settings
+from app.metrics import metrics
+
+# AIMD: +1/limite a cada sucesso (≈ +1 por janela), multiplicativo em erro ou RTT alto
+LIMIT_INITIAL = int(os.getenv("LIMIT_INITIAL", "10"))
+LIMIT_MIN = int(os.getenv("LIMIT_MIN", "1"))
+LIMIT_BACKOFF = float(os.getenv("LIMIT_BACKOFF", "0.9"))
+# RTT acima de baseline * tolerância (e acima do piso) conta como congestionamento
+LIMIT_RTT_TOLERANCE = float(os.getenv("LIMIT_RTT_TOLERANCE", "2.0"))
+LIMIT_RTT_FLOOR_MS = float(os.getenv("LIMIT_RTT_FLOOR_MS", "50"))
+# Quanto o baseline se move em direção a RTTs maiores a cada amostra
+LIMIT_BASELINE_DRIFT = 0.01
+
+
+class AIMDLimiter:
+    def __init__(
+        self,
+        name: str,
+        initial: int = LIMIT_INITIAL,
+        min_limit: int = LIMIT_MIN,
+        max_limit: int = 0,
+    ):
+        self.name = name
+        self.min_limit = min_limit
+        self.max_limit = max_limit or get_settings().processor_max_concurrency
+        self.limit = float(min(max(initial, min_limit), self.max_limit))
+        self.in_flight = 0
+        self.rtt_baseline = 0.0
+        self.drops = 0
+        self._waiters = deque()
+
+    async def acquire(self):
+        while self.in_flight >= int(self.limit):
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter.done() and not waiter.cancelled():
+                    # Vaga recebida e não usada: repassa para o próximo
+                    self._wake()
+                raise
+        self.in_flight += 1
+
+    def release(self, rtt_ms: float, ok: bool):
+        self.in_flight -= 1
+        self._update(rtt_ms, ok)
+        self._wake()
+
+    def _update(self, rtt_ms: float, ok: bool):
+        if ok:
+            if not self.rtt_baseline or rtt_ms < self.rtt_baseline:
+                self.rtt_baseline = rtt_ms
+            else:
+                self.rtt_baseline += (rtt_ms - self.rtt_baseline) * LIMIT_BASELINE_DRIFT
+
+        congested = rtt_ms > max(
+            self.rtt_baseline * LIMIT_RTT_TOLERANCE, LIMIT_RTT_FLOOR_MS
+        )
+        if not ok or congested:
+            self.drops += 1
+            self.limit = max(self.min_limit, self.limit * LIMIT_BACKOFF)
+        elif self.in_flight + 1 >= self.limit / 2:
+            # Só cresce quando o limite atual está de fato sendo usado
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+
+    def _wake(self):
+        free = int(self.limit) - self.in_flight
+        while free > 0 and self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                free -= 1
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "limit": int(self.limit),
+            "in_flight": self.in_flight,
+            "waiting": len(self._waiters),
+            "rtt_baseline_ms": round(self.rtt_baseline, 2),
+            "drops": self.drops,
+        }
+
+
+limiters: Dict[str, AIMDLimiter] = {
+    name: AIMDLimiter(name) for name in ("default", "fallback")
+}
+
+
+def get_limiter(processor_type: str) -> AIMDLimiter:
+    return limiters[processor_type]
+
+
+def limiter_stats() -> Dict[str, Dict[str, float]]:
+    return {name: limiter.stats() for name, limiter in limiters.items()}
+
+
+def publish_limiter_gauges():
+    for name, stats in limiter_stats().items():
+        metrics.set_gauge("processor_concurrency_limit", stats["limit"], processor=name)
+        metrics.set_gauge("processor_in_flight", stats["in_flight"], processor=name)
+        metrics.set_gauge("processor_waiting", stats["waiting"], processor=name)
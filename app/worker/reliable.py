@@ -0,0 +1,182 @@
+import asyncio
+import os
+import time
+from typing import List
+
+from app.database.redis_pool import redis_raw_client
+from app.metrics import count_error
+
+# Tempo que os itens de um worker podem ficar em processamento sem heartbeat
+VISIBILITY_TIMEOUT = float(os.getenv("QUEUE_VISIBILITY_TIMEOUT", "15"))
+# Prazo de cada item em processamento, mesmo com o worker vivo: cobre itens
+# perdidos dentro de um worker que segue renovando o lease. Precisa passar da
+# espera na fila local mais as chamadas aos processors.
+ITEM_VISIBILITY_TIMEOUT = float(os.getenv("QUEUE_ITEM_TIMEOUT", "60"))
+REAP_BATCH = 100
+
+# Move até ARGV[1] itens da fila para a lista de processamento do worker e
+# registra o prazo de cada um (ARGV[2], epoch ms)
+_FETCH = """
+local items = redis.call('LRANGE', KEYS[1], 0, tonumber(ARGV[1]) - 1)
+if #items > 0 then
+    redis.call('LTRIM', KEYS[1], #items, -1)
+    redis.call('RPUSH', KEYS[2], unpack(items))
+    local deadlines = {}
+    for _, item in ipairs(items) do
+        deadlines[#deadlines + 1] = ARGV[2]
+        deadlines[#deadlines + 1] = item
+    end
+    redis.call('ZADD', KEYS[3], unpack(deadlines))
+end
+return items
+"""
+
+# Prazos vencidos: o que ainda está na lista de processamento volta para o
+# início da fila. Os confirmados não passam por aqui, então os prazos deles
+# só saem do sorted set quando vencem.
+_REAP = """
+local expired = redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', ARGV[1], 'LIMIT', 0, ARGV[2])
+local moved = 0
+for _, item in ipairs(expired) do
+    redis.call('ZREM', KEYS[2], item)
+    if redis.call('LREM', KEYS[1], 1, item) == 1 then
+        redis.call('LPUSH', KEYS[3], item)
+        moved = moved + 1
+    end
+end
+return moved
+"""
+
+# Devolve a lista de processamento para o início da fila, mantendo a ordem.
+# Com ARGV[1] == '1' só age se o lease do dono já expirou.
+_REQUEUE = """
+if ARGV[1] == '1' and redis.call('EXISTS', KEYS[2]) == 1 then
+    return -1
+end
+local moved = 0
+while redis.call('LMOVE', KEYS[1], KEYS[3], 'RIGHT', 'LEFT') do
+    moved = moved + 1
+end
+redis.call('SREM', KEYS[4], ARGV[2])
+redis.call('DEL', KEYS[5])
+return moved
+"""
+
+
+class ReliableQueue:
+    def __init__(
+        self,
+        queue_key: str,
+        worker_id: str,
+        visibility_timeout: float = VISIBILITY_TIMEOUT,
+        item_timeout: float = ITEM_VISIBILITY_TIMEOUT,
+    ):
+        self.queue_key = queue_key
+        self.worker_id = worker_id
+        self.visibility_timeout = visibility_timeout
+        self.item_timeout = item_timeout
+        self.workers_key = f"{queue_key}:workers"
+        self.processing_key = self._processing_key(worker_id)
+        self.lease_key = self._lease_key(worker_id)
+        self.deadlines_key = self._deadlines_key(worker_id)
+        self._fetch = redis_raw_client.register_script(_FETCH)
+        self._requeue = redis_raw_client.register_script(_REQUEUE)
+        self._reap = redis_raw_client.register_script(_REAP)
+
+    def _processing_key(self, worker_id: str) -> str:
+        return f"{self.queue_key}:processing:{worker_id}"
+
+    def _lease_key(self, worker_id: str) -> str:
+        return f"{self.queue_key}:lease:{worker_id}"
+
+    def _deadlines_key(self, worker_id: str) -> str:
+        return f"{self.queue_key}:deadlines:{worker_id}"
+
+    def deadline_ms(self) -> int:
+        return int((time.time() + self.item_timeout) * 1000)
+
+    async def start(self):
+        # Itens de uma execução anterior com o mesmo id voltam para a fila
+        await self.requeue(self.worker_id, only_expired=False)
+        await self.renew_lease()
+
+    async def renew_lease(self):
+        pipe = redis_raw_client.pipeline(transaction=False)
+        pipe.set(self.lease_key, 1, px=int(self.visibility_timeout * 1000))
+        pipe.sadd(self.workers_key, self.worker_id)
+        await pipe.execute()
+
+    async def fetch(self, count: int, block_timeout: float) -> List[bytes]:
+        # Um único round-trip com a fila cheia; BLMOVE apenas quando vazia
+        items = await self._fetch(
+            keys=[
+                self.queue_key,
+                self.processing_key,
+                self.deadlines_key,
+            ],
+            args=[count, self.deadline_ms()],
+        )
+        if items:
+            return items
+
+        item = await redis_raw_client.blmove(
+            self.queue_key, self.processing_key, block_timeout, "LEFT", "RIGHT"
+        )
+        if not item:
+            return []
+        await redis_raw_client.zadd(self.deadlines_key, {item: self.deadline_ms()})
+        return [item]
+
+    async def release(self) -> int:
+        # Shutdown: o que não foi confirmado volta para a fila imediatamente
+        return await self.requeue(self.worker_id, only_expired=False)
+
+    async def ack(self, item: bytes):
+        await redis_raw_client.lrem(self.processing_key, 1, item)
+
+    async def requeue(self, worker_id: str, only_expired: bool = True) -> int:
+        return await self._requeue(
+            keys=[
+                self._processing_key(worker_id),
+                self._lease_key(worker_id),
+                self.queue_key,
+                self.workers_key,
+                self._deadlines_key(worker_id),
+            ],
+            args=["1" if only_expired else "0", worker_id],
+        )
+
+    async def reap_stale(self, worker_id: str) -> int:
+        return await self._reap(
+            keys=[
+                self._processing_key(worker_id),
+                self._deadlines_key(worker_id),
+                self.queue_key,
+            ],
+            args=[int(time.time() * 1000), REAP_BATCH],
+        )
+
+    async def run_heartbeat(self):
+        while True:
+            try:
+                await self.renew_lease()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                count_error("heartbeat")
+            await asyncio.sleep(self.visibility_timeout / 3)
+
+    async def run_reaper(self):
+        # Reenfileira itens de workers cujo lease expirou (crash / OOM) e,
+        # de qualquer worker, inclusive este, itens com o prazo vencido
+        while True:
+            await asyncio.sleep(self.visibility_timeout / 2)
+            try:
+                for member in await redis_raw_client.smembers(self.workers_key):
+                    worker_id = member.decode()
+                    if worker_id == self.worker_id or await self.requeue(worker_id) < 0:
+                        await self.reap_stale(worker_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                count_error("reaper")
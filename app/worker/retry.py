@@ -0,0 +1,145 @@
+import asyncio
+import os
+import random
+import sys
+import time
+from typing import List, Optional, Tuple
+
+from app.database.redis_pool import redis_raw_client
+from app.database.records import with_retry_count
+from app.metrics import count_error
+from app.worker.reliable import ReliableQueue
+
+RETRY_KEY = "payment_retry"
+DEAD_LETTER_KEY = "payment_dead_letter"
+QUEUE_KEY = "payment_queue"
+
+# Tentativas extras antes de aplicar a política de desistência
+MAX_RETRIES = int(os.getenv("MAX_RETRIES", "10"))
+# Backoff exponencial: base * 2^tentativa, limitado a RETRY_MAX_MS, com jitter
+RETRY_BASE_MS = int(os.getenv("RETRY_BASE_MS", "250"))
+RETRY_MAX_MS = int(os.getenv("RETRY_MAX_MS", "5000"))
+# "dead_letter" guarda a entrada em payment_dead_letter para ser reenfileirada
+# depois da queda (fora do summary até lá, ocupa memória no Redis); "error"
+# registra com processor="error" e o pagamento nunca mais é tentado; "drop"
+# descarta
+RETRY_GIVE_UP = os.getenv("RETRY_GIVE_UP", "dead_letter")
+DEAD_LETTER_REQUEUE_BATCH = 500
+RETRY_POLL_INTERVAL = float(os.getenv("RETRY_POLL_INTERVAL", "0.05"))
+RETRY_POLL_BATCH = int(os.getenv("RETRY_POLL_BATCH", "50"))
+
+# Retira os itens vencidos; com ARGV[3] == '1' eles entram na lista de
+# processamento do worker na mesma operação, com o prazo ARGV[4] (epoch ms)
+# no sorted set de prazos KEYS[3]
+_TAKE_DUE = """
+local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, ARGV[2])
+if #due > 0 then
+    redis.call('ZREM', KEYS[1], unpack(due))
+    if ARGV[3] == '1' then
+        redis.call('RPUSH', KEYS[2], unpack(due))
+        local deadlines = {}
+        for _, item in ipairs(due) do
+            deadlines[#deadlines + 1] = ARGV[4]
+            deadlines[#deadlines + 1] = item
+        end
+        redis.call('ZADD', KEYS[3], unpack(deadlines))
+    end
+end
+return due
+"""
+
+_take_due = redis_raw_client.register_script(_TAKE_DUE)
+
+
+def retry_delay_ms(retry_count: int) -> float:
+    delay = min(RETRY_MAX_MS, RETRY_BASE_MS * (2**retry_count))
+    # Metade fixa, metade aleatória: espalha os workers sem zerar o backoff
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+def should_give_up(retry_count: int) -> bool:
+    return retry_count >= MAX_RETRIES
+
+
+async def schedule_retry(
+    entry: bytes, retry_count: int, ack: Optional[Tuple[str, bytes]] = None
+):
+    # Corpo e requested_at originais são mantidos; só o retry_count do cabeçalho muda
+    next_attempt = time.time() * 1000 + retry_delay_ms(retry_count)
+
+    pipe = redis_raw_client.pipeline(transaction=True)
+    pipe.zadd(RETRY_KEY, {with_retry_count(entry, retry_count + 1): next_attempt})
+    if ack is not None:
+        pipe.lrem(ack[0], 1, ack[1])
+    await pipe.execute()
+
+
+async def hold_payment(
+    entry: bytes, delay_ms: float, ack: Optional[Tuple[str, bytes]] = None
+):
+    # Adiamento decidido pelo roteamento: volta sem gastar uma tentativa
+    pipe = redis_raw_client.pipeline(transaction=True)
+    pipe.zadd(RETRY_KEY, {entry: time.time() * 1000 + delay_ms})
+    if ack is not None:
+        pipe.lrem(ack[0], 1, ack[1])
+    await pipe.execute()
+
+
+async def dead_letter(entry: bytes, ack: Optional[Tuple[str, bytes]] = None):
+    pipe = redis_raw_client.pipeline(transaction=True)
+    pipe.rpush(DEAD_LETTER_KEY, entry)
+    if ack is not None:
+        pipe.lrem(ack[0], 1, ack[1])
+    await pipe.execute()
+
+
+async def requeue_dead_letters(batch: int = DEAD_LETTER_REQUEUE_BATCH) -> int:
+    # Devolve as desistências para a payment_queue com as tentativas zeradas
+    moved = 0
+    while True:
+        entries = await redis_raw_client.lrange(DEAD_LETTER_KEY, 0, batch - 1)
+        if not entries:
+            return moved
+        pipe = redis_raw_client.pipeline(transaction=True)
+        pipe.rpush(QUEUE_KEY, *(with_retry_count(entry, 0) for entry in entries))
+        pipe.ltrim(DEAD_LETTER_KEY, len(entries), -1)
+        await pipe.execute()
+        moved += len(entries)
+
+
+async def take_due_retries(
+    limit: int = RETRY_POLL_BATCH, reliable: Optional[ReliableQueue] = None
+) -> List[bytes]:
+    if reliable is None:
+        keys = [RETRY_KEY, "", ""]
+        args = [int(time.time() * 1000), limit, "0", 0]
+    else:
+        keys = [RETRY_KEY, reliable.processing_key, reliable.deadlines_key]
+        args = [int(time.time() * 1000), limit, "1", reliable.deadline_ms()]
+    return await _take_due(keys=keys, args=args)
+
+
+async def consume_retries(
+    dispatch: asyncio.Queue,
+    reliable: Optional[ReliableQueue] = None,
+    stop: Optional[asyncio.Event] = None,
+):
+    while stop is None or not stop.is_set():
+        try:
+            due = await take_due_retries(reliable=reliable)
+            for item in due:
+                await dispatch.put(item)
+            if len(due) == RETRY_POLL_BATCH:
+                continue
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            count_error("retry_poll")
+        await asyncio.sleep(RETRY_POLL_INTERVAL)
+
+
+if __name__ == "__main__":
+    # python -m app.worker.retry requeue
+    if sys.argv[1:] != ["requeue"]:
+        sys.exit("uso: python -m app.worker.retry requeue")
+    print(f"reenfileirados: {asyncio.run(requeue_dead_letters())}")
@@ -1,14 +1,57 @@
 import asyncio
+import os
 import signal
 import sys
+from app.worker import worker
 from app.worker.worker import start_workers, NUM_WORKERS, MAX_CONCURRENT_REQUESTS
+from app.worker.batcher import payment_batcher
+from app.worker.limiter import limiter_stats
+from app.memory import install_report_signal, tune_gc
+
+try:
+    import uvloop
+except ImportError:
+    # uvloop vem com uvicorn[standard], mas não existe em todas as plataformas
+    uvloop = None
+
+# Processos de worker supervisionados neste container; 1 roda sem supervisor
+WORKER_PROCESSES = int(os.getenv("WORKER_PROCESSES", "1"))
+
+_shutting_down = False
 
 
 async def shutdown(signal, loop):
+    # SIGINT do terminal e SIGTERM do supervisor podem chegar juntos
+    global _shutting_down
+    if _shutting_down:
+        return
+    _shutting_down = True
+
     # print(f"Recebido sinal {signal.name}...")
+    pending = await worker.drain_workers()
+    if pending:
+        print(f"Drain expirou com {pending} pagamentos na fila local")
+    await payment_batcher.stop()
+
     tasks = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
     [task.cancel() for task in tasks]
     await asyncio.gather(*tasks, return_exceptions=True)
+
+    # Persiste o que ainda está no batcher antes de encerrar
+    try:
+        await payment_batcher.flush()
+    except Exception as e:
+        print(f"Falha ao persistir lote final: {e}")
+    print(f"Batcher: {payment_batcher.stats()}")
+    print(f"Limiters: {limiter_stats()}")
+
+    # Pagamentos ainda não confirmados voltam para a fila sem esperar o reaper
+    if worker.reliable_queue is not None:
+        try:
+            await worker.reliable_queue.release()
+        except Exception as e:
+            print(f"Falha ao devolver pagamentos para a fila: {e}")
+
     loop.stop()
 
 
@@ -17,14 +60,17 @@ def handle_exit(signum, frame):
     sys.exit(0)
 
 
-async def main():
+async def main(exit_on_sigint: bool = True):
+    tune_gc()
     loop = asyncio.get_running_loop()
+    install_report_signal(loop)
     for sig in (signal.SIGTERM, signal.SIGINT):
         loop.add_signal_handler(
             sig, lambda s=sig: asyncio.create_task(shutdown(s, loop))
         )
 
-    signal.signal(signal.SIGINT, handle_exit)
+    if exit_on_sigint:
+        signal.signal(signal.SIGINT, handle_exit)
 
     # print(f"Iniciando {NUM_WORKERS} workers com {MAX_CONCURRENT_REQUESTS} requests concorrentes...")
 
@@ -37,5 +83,45 @@ async def main():
         sys.exit(1)
 
 
+def run_loop(coro):
+    try:
+        if uvloop is None:
+            asyncio.run(coro)
+            return
+        with asyncio.Runner(loop_factory=uvloop.new_event_loop) as runner:
+            runner.run(coro)
+    except (RuntimeError, asyncio.CancelledError):
+        # shutdown() cancela main() e para o loop antes de ela terminar
+        pass
+
+
+def worker_process(index: int):
+    # Cada filho precisa de um WORKER_ID próprio (lista de processamento,
+    # lease e métricas); sem WORKER_ID o pid já diferencia
+    base_id = os.getenv("WORKER_ID")
+    if base_id:
+        os.environ["WORKER_ID"] = f"{base_id}-{index + 1}"
+
+    # Ctrl+C chega ao grupo inteiro: o filho drena em vez de sair na hora
+    run_loop(main(exit_on_sigint=False))
+
+
+def run():
+    if WORKER_PROCESSES <= 1:
+        run_loop(main())
+        return
+
+    from app.supervisor import supervise
+
+    # Filhos criados por fork antes de qualquer conexão: cada um abre os
+    # próprios pools de Redis e HTTP
+    supervise(
+        worker_process,
+        WORKER_PROCESSES,
+        "worker",
+        shutdown_timeout=worker.WORKER_DRAIN_TIMEOUT + 5,
+    )
+
+
 if __name__ == "__main__":
-    asyncio.run(main())
+    run()
@@ -1,113 +1,287 @@
 import asyncio
-import orjson
-from app.database.storage import save_payment
-from app.database.redis_pool import redis_client
-from app.processor.processor import process_payment_in_processor
-from datetime import datetime
-
-
-BATCH_SIZE = 1
-MAX_CONCURRENT_REQUESTS = 10
-NUM_WORKERS = 3
-MAX_RETRIES = 3
-IDLE_SLEEP = 0.01
+import os
+import struct
+import time
+from app.database.idempotency import BUSY, DONE, claim_payment, release_claim
+from app.database.records import decode_entry
+from app.database.redis_pool import redis_raw_client
+from app.client.session import warmup_transport
+from app.processor.processor import get_processor_url, process_payment_in_processor
+from app.processor.health import (
+    get_health_states,
+    run_health_monitor,
+    refresh_health_state,
+)
+from app.processor.routing import ROUTING_HOLD_MS, get_strategy
+from app.processor.breaker import get_breaker, refresh_breakers
+from app.worker.batcher import payment_batcher
+from app.worker.limiter import get_limiter, publish_limiter_gauges
+from app.worker.reliable import ReliableQueue
+from app.worker.retry import (
+    RETRY_GIVE_UP,
+    consume_retries,
+    dead_letter,
+    hold_payment,
+    retry_delay_ms,
+    schedule_retry,
+    should_give_up,
+)
+from app.config import get_settings, get_worker_id
+from app.memory import freeze_heap, log_memory
+from app.metrics import count_error, metrics, publish_metrics
+from typing import List, Optional, Tuple
+
+
+QUEUE_KEY = "payment_queue"
+
+# Itens retirados da fila Redis por BLMPOP
+BATCH_SIZE = int(os.getenv("WORKER_POP_BATCH", "20"))
+# Tarefas que chamam os processors a partir da fila local; o número de
+# chamadas simultâneas a cada processor é controlado pelo limiter adaptativo
+MAX_CONCURRENT_REQUESTS = int(
+    os.getenv("MAX_CONCURRENT_REQUESTS", str(get_settings().processor_max_concurrency))
+)
+# Consumidores da fila Redis
+NUM_WORKERS = int(os.getenv("NUM_WORKERS", "1"))
+# Bloqueio do BLMPOP em segundos (abaixo do socket_timeout do pool)
+BLOCK_TIMEOUT = 1
 ERROR_SLEEP = 0.1
+# Consumo at-least-once com lista de processamento por worker
+RELIABLE_QUEUE = os.getenv("RELIABLE_QUEUE", "1") == "1"
+# Tempo máximo do shutdown para terminar os pagamentos já retirados da fila
+WORKER_DRAIN_TIMEOUT = float(os.getenv("WORKER_DRAIN_TIMEOUT", "5"))
+
+reliable_queue: Optional[ReliableQueue] = None
+routing = get_strategy()
+
+# Sinalizado no shutdown: os consumidores param de buscar itens novos
+stop_consuming = asyncio.Event()
+_dispatch: Optional[asyncio.Queue] = None
+_consumers: List[asyncio.Task] = []
+
+QUEUE_DWELL = metrics.histogram("queue_dwell_ms")
+FETCH_LATENCY = metrics.histogram("redis_op_ms", op="fetch")
+PROCESSOR_RTT = {
+    name: metrics.histogram("processor_rtt_ms", processor=name)
+    for name in ("default", "fallback")
+}
 
 
 async def process_payment_with_fallback(
-    payment_data: dict, retry_count: int = 0
+    entry: bytes,
+    ack: Optional[Tuple[str, bytes]] = None,
 ) -> bool:
-    requested_at = datetime.fromisoformat(
-        payment_data["requested_at"].replace("Z", "+00:00")
-    ).replace(tzinfo=None)  # Remover timezone para usar UTC
+    # Só o cabeçalho é lido; o corpo vai para o processor como chegou da API
+    retry_count, raw_id, cents, requested_ms, body = decode_entry(entry)
+    age_ms = time.time() * 1000 - requested_ms
+    QUEUE_DWELL.record(age_ms)
 
-    # Tentar primeiro o processor default
-    try:
-        result = await process_payment_in_processor(
-            payload=payment_data, processor_type="default"
-        )
+    # Idempotência por correlationId: pagamento já salvo só é confirmado;
+    # com outro worker no momento, volta mais tarde sem chamar o processor
+    state = await claim_payment(raw_id)
+    if state == DONE:
+        metrics.inc("duplicates_total")
+        if ack is not None:
+            await redis_raw_client.lrem(ack[0], 1, ack[1])
+        return False
+    if state == BUSY:
+        # Nenhum processor foi tentado: adia sem gastar uma das MAX_RETRIES
+        metrics.inc("claims_busy_total")
+        await hold_payment(entry, retry_delay_ms(retry_count), ack)
+        return False
 
-        # Se o default processou com sucesso, salvar
-        if result != "not avaiable":
-            await save_payment(
-                cid=payment_data["correlationId"],
-                amount=payment_data["amount"],
-                processor="default",
-                requested_at=requested_at,
-            )
-            return True
+    # Ordem definida pela estratégia de roteamento a partir do estado de
+    # saúde compartilhado; processors falhando são pulados sem pagar o timeout
+    order = routing.route(get_health_states(), age_ms)
+    if not order:
+        metrics.inc("routing_holds_total", strategy=routing.name)
+        await release_claim(raw_id)
+        await hold_payment(entry, ROUTING_HOLD_MS, ack)
+        return False
 
-    except Exception:
-        pass
+    for processor_type in order:
+        # Circuito aberto: pula sem gastar uma chamada (e o timeout)
+        breaker = get_breaker(processor_type)
+        if not await breaker.allow():
+            continue
 
-    # Se o default falhou ou não está disponível, tentar fallback
-    try:
-        result = await process_payment_in_processor(
-            payload=payment_data, processor_type="fallback"
-        )
+        # Limite adaptativo de chamadas simultâneas ao processor
+        limiter = get_limiter(processor_type)
+        await limiter.acquire()
 
-        # Se o fallback processou com sucesso, salvar
+        start = time.perf_counter()
+        ok = False
+        try:
+            result = await process_payment_in_processor(
+                body, processor_type=processor_type
+            )
+            # 422 é recusa do payload, não falha do processor
+            ok = True
+        except Exception:
+            metrics.inc(
+                "processor_calls_total", processor=processor_type, outcome="error"
+            )
+        finally:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            limiter.release(elapsed_ms, ok)
+            PROCESSOR_RTT[processor_type].record(elapsed_ms)
+
+        await breaker.record(ok, elapsed_ms)
+        if not ok:
+            continue
+
+        # Se o processor processou com sucesso, salvar
         if result != "not avaiable":
-            await save_payment(
-                cid=payment_data["correlationId"],
-                amount=payment_data["amount"],
-                processor="fallback",
-                requested_at=requested_at,
+            metrics.inc("processor_calls_total", processor=processor_type, outcome="ok")
+            metrics.inc("payments_total", processor=processor_type)
+            if processor_type == "fallback":
+                metrics.inc("fallback_total")
+            payment_batcher.add(
+                raw_id, cents, processor_type, requested_ms / 1000, ack=ack
             )
             return True
+        metrics.inc(
+            "processor_calls_total", processor=processor_type, outcome="rejected"
+        )
 
-    except Exception:
-        pass
+    # Nenhum processor aceitou: nova tentativa com backoff
+    if not should_give_up(retry_count):
+        await release_claim(raw_id)
+        await schedule_retry(entry, retry_count, ack)
+        metrics.inc("retries_total")
+        return False
 
-    # Se ambos falharam, salvar como erro
-    await save_payment(
-        cid=payment_data["correlationId"],
-        amount=payment_data["amount"],
-        processor="error",
-        requested_at=requested_at,
-    )
-    return True
+    metrics.inc("give_ups_total")
 
+    if RETRY_GIVE_UP == "error":
+        payment_batcher.add(raw_id, cents, "error", requested_ms / 1000, ack=ack)
+        return False
 
-async def process_payment_queue(semaphore: asyncio.Semaphore):
-    while True:
-        try:
-            async with semaphore:
-                payment_data = await redis_client.lpop("payment_queue")
+    await release_claim(raw_id)
+    if RETRY_GIVE_UP == "dead_letter":
+        await dead_letter(entry, ack)
+        return False
+    if ack is not None:
+        await redis_raw_client.lrem(ack[0], 1, ack[1])
+    return False
 
-                if payment_data:
-                    if isinstance(payment_data, bytes):
-                        payment_data = orjson.loads(payment_data)
 
-                    if isinstance(payment_data, str):
-                        payment_data = orjson.loads(payment_data)
+async def fetch_payments(batch_size: int):
+    if reliable_queue is not None:
+        return await reliable_queue.fetch(batch_size, BLOCK_TIMEOUT)
 
-                    if "retry_count" not in payment_data:
-                        payment_data["retry_count"] = 0
+    # BLMPOP retorna imediatamente até batch_size itens ou bloqueia até chegar um
+    # (a latência medida inclui o bloqueio com a fila vazia)
+    popped = await redis_raw_client.blmpop(
+        BLOCK_TIMEOUT, 1, QUEUE_KEY, direction="LEFT", count=batch_size
+    )
+    return popped[1] if popped else []
 
-                    await process_payment_with_fallback(
-                        payment_data, payment_data["retry_count"]
-                    )
 
-                await asyncio.sleep(IDLE_SLEEP)
+async def consume_payment_queue(dispatch: asyncio.Queue, batch_size: int = BATCH_SIZE):
+    while not stop_consuming.is_set():
+        try:
+            start = time.perf_counter()
+            items = await fetch_payments(batch_size)
+            FETCH_LATENCY.record((time.perf_counter() - start) * 1000)
+            for item in items:
+                # Fila local limitada: segura o consumo quando os processors estão lentos
+                await dispatch.put(item)
 
+        except asyncio.CancelledError:
+            raise
         except Exception:
+            count_error("fetch")
             await asyncio.sleep(ERROR_SLEEP)
 
 
-async def start_worker():
-    await process_payment_queue(asyncio.Semaphore(1))
+async def dispatch_payments(dispatch: asyncio.Queue):
+    while True:
+        item = await dispatch.get()
+        ack = None
+        if reliable_queue is not None:
+            ack = (reliable_queue.processing_key, item)
+
+        try:
+            await process_payment_with_fallback(item, ack=ack)
+        except asyncio.CancelledError:
+            raise
+        except (KeyError, TypeError, ValueError, struct.error):
+            # Item inválido: confirma para não voltar à fila indefinidamente
+            count_error("invalid_entry")
+            if reliable_queue is not None:
+                try:
+                    await reliable_queue.ack(item)
+                except Exception:
+                    count_error("ack")
+        except Exception:
+            # Falha inesperada (ex.: Redis): reagenda em vez de perder o pagamento
+            count_error("dispatch")
+            try:
+                await schedule_retry(item, decode_entry(item)[0], ack)
+            except Exception:
+                count_error("retry_schedule")
+        finally:
+            dispatch.task_done()
 
 
 async def start_workers(
     num_workers: int = NUM_WORKERS,
     max_concurrent_requests: int = MAX_CONCURRENT_REQUESTS,
 ):
-    semaphore = asyncio.Semaphore(max_concurrent_requests)
+    global reliable_queue, _dispatch
 
-    tasks = []
-    for i in range(num_workers):
-        task = asyncio.create_task(process_payment_queue(semaphore))
-        tasks.append(task)
+    # Conexões keep-alive abertas antes do primeiro pagamento
+    try:
+        await warmup_transport(
+            [get_processor_url("default"), get_processor_url("fallback")]
+        )
+    except Exception as e:
+        print(f"Warmup das conexões falhou: {e}")
 
-    await asyncio.gather(*tasks)
+    freeze_heap()
+    log_memory("inicialização")
+
+    dispatch = _dispatch = asyncio.Queue(maxsize=max_concurrent_requests * 2)
+
+    tasks = [
+        asyncio.create_task(run_health_monitor()),
+        asyncio.create_task(refresh_health_state()),
+        asyncio.create_task(refresh_breakers()),
+        asyncio.create_task(payment_batcher.run()),
+        asyncio.create_task(
+            publish_metrics(f"worker:{get_worker_id()}", refresh=publish_limiter_gauges)
+        ),
+    ]
+
+    if RELIABLE_QUEUE:
+        reliable_queue = ReliableQueue(QUEUE_KEY, get_worker_id())
+        await reliable_queue.start()
+        tasks.append(asyncio.create_task(reliable_queue.run_heartbeat()))
+        tasks.append(asyncio.create_task(reliable_queue.run_reaper()))
+
+    _consumers.append(
+        asyncio.create_task(consume_retries(dispatch, reliable_queue, stop_consuming))
+    )
+    for _ in range(num_workers):
+        _consumers.append(asyncio.create_task(consume_payment_queue(dispatch)))
+    for _ in range(max_concurrent_requests):
+        tasks.append(asyncio.create_task(dispatch_payments(dispatch)))
+
+    await asyncio.gather(*tasks, *_consumers)
+
+
+async def drain_workers(timeout: float = WORKER_DRAIN_TIMEOUT) -> int:
+    # Para de consumir e espera os pagamentos já retirados da fila passarem
+    # pelos processors; retorna quantos ficaram na fila local
+    stop_consuming.set()
+    if _dispatch is None:
+        return 0
+    try:
+        async with asyncio.timeout(timeout):
+            # Um consumidor pode estar no meio de um BLMPOP (até BLOCK_TIMEOUT)
+            await asyncio.gather(*_consumers, return_exceptions=True)
+            await _dispatch.join()
+    except TimeoutError:
+        pass
+    return _dispatch.qsize()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""Compara o custo de CPU por requisição do fast path ASGI com o Starlette
+nas duas rotas quentes, chamando as aplicações em processo (sem socket e sem
+Redis: o RPUSH e o summary são substituídos por respostas fixas).
+
+Uso: python -m benchmarks.bench_asgi [requisições]
+"""
+
+import asyncio
+import sys
+import time
+import uuid
+
+import orjson
+
+from app import backpressure
+from app.fastpath import FastPathApp
+from app.main import starlette_app
+from app.routes import payments
+
+SUMMARY = {
+    "default": {"totalRequests": 1000, "totalCents": 1990000},
+    "fallback": {"totalRequests": 50, "totalCents": 99500},
+}
+
+
+async def fake_rpush(key, *values):
+    return 1
+
+
+async def fake_summary(ts_from, ts_to):
+    return SUMMARY
+
+
+def http_scope(method: str, path: str, query: bytes = b""):
+    return {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": query,
+        "root_path": "",
+        "headers": [(b"host", b"localhost:9999")],
+        "client": ("127.0.0.1", 50000),
+        "server": ("127.0.0.1", 9999),
+    }
+
+
+async def call(app, scope, body: bytes = b""):
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    status = []
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            status.append(message["status"])
+
+    await app(scope, receive, send)
+    return status[0]
+
+
+async def measure(app, scope, bodies) -> float:
+    start = time.process_time()
+    for body in bodies:
+        await call(app, scope, body)
+    return (time.process_time() - start) / len(bodies)
+
+
+async def run(total: int):
+    backpressure.redis_client.rpush = fake_rpush
+    payments.get_cached_summary = fake_summary
+
+    fast_app = FastPathApp(starlette_app)
+    post_scope = http_scope("POST", "/payments")
+    get_scope = http_scope(
+        "GET",
+        "/payments-summary",
+        b"from=2025-07-10T12:34:56.000Z&to=2025-07-10T12:35:56.000Z",
+    )
+    post_bodies = [
+        orjson.dumps({"correlationId": str(uuid.uuid4()), "amount": 19.90})
+        for _ in range(total)
+    ]
+    get_bodies = [b""] * total
+
+    assert await call(fast_app, post_scope, post_bodies[0]) == 201
+    assert await call(starlette_app, post_scope, post_bodies[0]) == 201
+
+    print(f"requisições: {total}")
+    for name, scope, bodies in (
+        ("POST /payments", post_scope, post_bodies),
+        ("GET /payments-summary", get_scope, get_bodies),
+    ):
+        slow = await measure(starlette_app, scope, bodies)
+        fast = await measure(fast_app, scope, bodies)
+        print(
+            f"{name:<22} starlette {slow * 1e6:6.1f} µs  "
+            f"fast path {fast * 1e6:6.1f} µs  ({slow / fast:.1f}x)"
+        )
+
+
+def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    asyncio.run(run(total))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""Compara o membro JSON legado com o registro binário v1 do sorted set.
+
+Uso: python -m benchmarks.bench_records [quantidade]
+"""
+
+import random
+import sys
+import time
+import uuid
+
+import orjson
+
+from app.database.records import encode_record, summarize_records, to_cents
+
+
+def build_members(total: int):
+    legacy = []
+    binary = []
+    for i in range(total):
+        cid = str(uuid.uuid4())
+        amount = round(random.uniform(1, 100), 2)
+        processor = "default" if i % 4 else "fallback"
+        legacy.append(
+            orjson.dumps(
+                {
+                    "correlationId": cid,
+                    "amount": amount,
+                    "processor": processor,
+                    "requested_at": 1_750_000_000 + i / 1000,
+                }
+            )
+        )
+        binary.append(encode_record(cid, to_cents(amount), processor))
+    return legacy, binary
+
+
+def legacy_summary(members):
+    # Caminho anterior: orjson.loads por membro
+    totals = {}
+    for member in members:
+        payment = orjson.loads(member)
+        entry = totals.setdefault(payment["processor"], [0, 0])
+        entry[0] += 1
+        entry[1] += to_cents(payment["amount"])
+    return totals
+
+
+def timed(fn, members, rounds: int = 5) -> float:
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        fn(members)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    legacy, binary = build_members(total)
+
+    legacy_bytes = sum(len(m) for m in legacy) / total
+    binary_bytes = sum(len(m) for m in binary) / total
+    print(f"payments:             {total}")
+    print(f"bytes/membro JSON:    {legacy_bytes:.1f}")
+    print(f"bytes/membro binário: {binary_bytes:.1f}")
+
+    legacy_time = timed(legacy_summary, legacy)
+    binary_time = timed(summarize_records, binary)
+    print(f"decode JSON:          {legacy_time * 1000:.1f} ms")
+    print(f"decode binário:       {binary_time * 1000:.1f} ms")
+    print(f"speedup:              {legacy_time / binary_time:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
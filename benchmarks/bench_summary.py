@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""Compara o summary somado em Python (membros das bordas e buckets
+trafegam até a API) com o script Lua que soma tudo dentro do Redis e devolve
+só os totais, para 10 mil, 100 mil e 1 milhão de pagamentos.
+
+Usa o Redis de REDIS_HOST e APAGA os pagamentos existentes.
+
+Uso: python -m benchmarks.bench_summary [quantidade ...]
+"""
+
+import asyncio
+import random
+import sys
+import time
+import uuid
+
+from app.database import storage
+from app.database.records import correlation_id_bytes, encode_raw_record
+from app.database.redis_pool import redis_raw_client
+
+# Ritmo aproximado da rinha: define quantos segundos (buckets) a carga ocupa
+PAYMENTS_PER_SECOND = 250
+BASE_TS = 1_752_000_000.0
+QUERIES = 50
+
+
+async def populate(total: int) -> float:
+    # Escrita direta (sem o script de gravação) para montar 1M rápido
+    await storage.purge_payments()
+    span = max(60.0, total / PAYMENTS_PER_SECOND)
+    batch = 5000
+    for offset in range(0, total, batch):
+        pipe = redis_raw_client.pipeline(transaction=False)
+        members = {}
+        for _ in range(min(batch, total - offset)):
+            ts = round(BASE_TS + random.uniform(0, span), 3)
+            processor = "default" if random.random() < 0.8 else "fallback"
+            raw_id = correlation_id_bytes(str(uuid.uuid4()))
+            bucket = int(ts // storage.BUCKET_SECONDS)
+            partition = storage.partition_of(ts)
+            members.setdefault(partition, {})[
+                encode_raw_record(raw_id, 1990, processor)
+            ] = ts
+            pipe.hincrby(storage.bucket_key(processor, "count", partition), bucket, 1)
+            pipe.hincrby(
+                storage.bucket_key(processor, "cents", partition), bucket, 1990
+            )
+        for partition, records in members.items():
+            pipe.zadd(storage.partition_key(partition), records)
+            pipe.zadd(storage.KEY_PARTITIONS, {partition: partition})
+        await pipe.execute()
+    return span
+
+
+async def timed(fn, windows) -> float:
+    start = time.perf_counter()
+    for ts_from, ts_to in windows:
+        await fn(ts_from, ts_to)
+    return (time.perf_counter() - start) / len(windows) * 1000
+
+
+async def run(sizes):
+    for total in sizes:
+        span = await populate(total)
+        # Janelas com bordas fracionárias, como as do k6, e o summary completo
+        windows = []
+        for _ in range(QUERIES):
+            start = BASE_TS + random.uniform(0, span * 0.9)
+            windows.append((start, start + random.uniform(1, span * 0.1)))
+        full = [(None, None)] * 5
+
+        assert await storage._script_summary(
+            *windows[0]
+        ) == await storage._scan_summary(*windows[0])
+        print(f"pagamentos: {total} ({span:.0f}s de buckets)")
+        for name, cases in (("janela", windows), ("completo", full)):
+            scan = await timed(storage._scan_summary, cases)
+            script = await timed(storage._script_summary, cases)
+            print(
+                f"  {name:<9} python {scan:8.2f} ms   lua {script:8.2f} ms   "
+                f"({scan / script:.1f}x)"
+            )
+
+    await storage.purge_payments()
+    await redis_raw_client.aclose()
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10_000, 100_000, 1_000_000]
+    asyncio.run(run(sizes))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""Compara o transporte httpx com o cliente HTTP/1.1 mínimo contra um
+processor local (keep-alive, resposta 200 fixa).
+
+Uso: python -m benchmarks.bench_transport [requisições] [concorrência]
+"""
+
+import asyncio
+import sys
+import time
+
+import httpx
+import orjson
+
+from app.client.transport import HttpxTransport, RawHttpTransport
+
+RESPONSE = (
+    b"HTTP/1.1 200 OK\r\n"
+    b"Content-Type: application/json\r\n"
+    b"Content-Length: 44\r\n"
+    b"\r\n"
+    b'{"message":"payment processed successfully"}'
+)
+
+
+async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    try:
+        while True:
+            length = 0
+            while True:
+                line = await reader.readline()
+                if not line:
+                    return
+                if line == b"\r\n":
+                    break
+                if line.lower().startswith(b"content-length:"):
+                    length = int(line.split(b":")[1])
+            if length:
+                await reader.readexactly(length)
+            writer.write(RESPONSE)
+    except (ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+        pass
+    finally:
+        writer.close()
+
+
+async def run(transport, url: str, total: int, concurrency: int):
+    body = orjson.dumps(
+        {
+            "correlationId": "4a7901b8-7d26-4d9d-aa19-4dc1c7cf60b3",
+            "amount": 19.9,
+            "requestedAt": "2025-07-15T12:34:56.000Z",
+        }
+    )
+    await transport.warmup([url], concurrency)
+
+    remaining = total
+
+    async def client():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            status, _ = await transport.post(url, body, timeout=5.0)
+            assert status == 200
+
+    wall = time.perf_counter()
+    cpu = time.process_time()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    cpu = time.process_time() - cpu
+    wall = time.perf_counter() - wall
+    await transport.aclose()
+    return wall, cpu
+
+
+async def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+
+    server = await asyncio.start_server(handle, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    url = f"http://127.0.0.1:{port}/payments"
+
+    limits = httpx.Limits(
+        max_connections=concurrency, max_keepalive_connections=concurrency
+    )
+    transports = {
+        "httpx": HttpxTransport(httpx.AsyncClient(limits=limits)),
+        "raw": RawHttpTransport(max_idle=concurrency),
+    }
+
+    print(f"requisições: {total}  concorrência: {concurrency}")
+    # O servidor roda no mesmo processo: o CPU medido inclui os dois lados
+    for name, transport in transports.items():
+        wall, cpu = await run(transport, url, total, concurrency)
+        print(
+            f"{name:6s} {total / wall:9.0f} req/s  "
+            f"{cpu / total * 1e6:7.1f} µs CPU/req  ({wall:.2f}s)"
+        )
+
+    server.close()
+    await server.wait_closed()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
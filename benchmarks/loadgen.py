@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+"""Reproduz os cenários da rinha sem os containers externos: sobe os dois
+processors locais (benchmarks.processor_stub), a API e os workers apontando
+para eles e para um Redis local, gera carga em rampa como o k6 e compara o
+/payments-summary com o que os processors registraram.
+
+Relata vazão, latência p50/p99/p99.9 do POST /payments, inconsistências e
+taxas totais.
+
+Uso: python -m benchmarks.loadgen [--scenario rinha|steady|outage]
+     [--vus 500] [--duration 60] [--workers 2] [--worker-processes 1]
+     [--no-spawn]
+"""
+
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Dict, List, Tuple
+
+import orjson
+import redis.asyncio as redis
+
+from app.client.transport import RawHttpTransport
+from benchmarks.processor_stub import ProcessorStub
+
+API_URL = "http://127.0.0.1:9999"
+DEFAULT_PORT = 8001
+FALLBACK_PORT = 8002
+AMOUNT = 19.90
+
+# Estágios (segundo, default delay, default falhando, fallback delay,
+# fallback falhando), os mesmos tempos do rinha.js escalados pela duração
+SCENARIOS: Dict[str, List[Tuple[float, int, bool, int, bool]]] = {
+    "rinha": [
+        (0.0, 0, False, 0, False),
+        (10 / 60, 100, False, 0, False),
+        (20 / 60, 100, True, 0, False),
+        (30 / 60, 2000, True, 1000, True),
+        (40 / 60, 20, False, 20, False),
+        (50 / 60, 0, False, 5000, False),
+    ],
+    "steady": [(0.0, 0, False, 0, False)],
+    "outage": [
+        (0.0, 0, False, 0, False),
+        (0.25, 0, True, 0, False),
+        (0.75, 0, False, 0, False),
+    ],
+}
+
+
+def iso(ts: float) -> str:
+    return (
+        datetime.fromtimestamp(ts, timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3]
+        + "Z"
+    )
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, int(len(values) * pct / 100))
+    return values[index]
+
+
+def spawn_services(
+    workers: int, redis_host: str, worker_processes: int = 1
+) -> List[subprocess.Popen]:
+    env = dict(
+        os.environ,
+        REDIS_HOST=redis_host,
+        PROCESSOR_DEFAULT_URL=f"http://127.0.0.1:{DEFAULT_PORT}",
+        PROCESSOR_FALLBACK_URL=f"http://127.0.0.1:{FALLBACK_PORT}",
+        HTTP_TRANSPORT=os.getenv("HTTP_TRANSPORT", "raw"),
+        WORKER_PROCESSES=str(worker_processes),
+    )
+    processes = [subprocess.Popen([sys.executable, "-m", "app.main"], env=env)]
+    for i in range(workers):
+        processes.append(
+            subprocess.Popen(
+                [sys.executable, "-m", "app.worker.setup"],
+                env=dict(env, WORKER_ID=f"loadgen-{i + 1}"),
+            )
+        )
+    return processes
+
+
+class LoadGenerator:
+    def __init__(self, vus: int, duration: float):
+        self.vus = vus
+        self.duration = duration
+        self.transport = RawHttpTransport(max_idle=vus)
+        self.latencies: List[float] = []
+        self.statuses: Dict[int, int] = {}
+        self.errors = 0
+
+    async def post_payment(self):
+        body = orjson.dumps({"correlationId": str(uuid.uuid4()), "amount": AMOUNT})
+        start = time.perf_counter()
+        try:
+            status, _ = await self.transport.post(
+                f"{API_URL}/payments", body, timeout=1.5
+            )
+        except Exception:
+            self.errors += 1
+            return
+        self.latencies.append((time.perf_counter() - start) * 1000)
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+
+    async def virtual_user(self, start_at: float, end_at: float):
+        await asyncio.sleep(max(0.0, start_at - time.monotonic()))
+        while time.monotonic() < end_at:
+            await self.post_payment()
+            # Mesmo ritmo do k6: uma requisição e sleep(1)
+            await asyncio.sleep(1)
+
+    async def run(self):
+        now = time.monotonic()
+        end_at = now + self.duration
+        # ramping-vus: de 1 até vus ao longo da duração
+        await asyncio.gather(
+            *(
+                self.virtual_user(now + self.duration * i / self.vus, end_at)
+                for i in range(self.vus)
+            )
+        )
+
+
+async def apply_stages(stubs: Dict[str, ProcessorStub], scenario, duration: float):
+    start = time.monotonic()
+    for at, d_delay, d_fail, f_delay, f_fail in scenario:
+        await asyncio.sleep(max(0.0, start + at * duration - time.monotonic()))
+        stubs["default"].configure(delay_ms=d_delay, failing=d_fail)
+        stubs["fallback"].configure(delay_ms=f_delay, failing=f_fail)
+        print(
+            f"[{time.monotonic() - start:5.1f}s] default {d_delay}ms{' falhando' if d_fail else ''}"
+            f" | fallback {f_delay}ms{' falhando' if f_fail else ''}"
+        )
+
+
+async def wait_ready(transport: RawHttpTransport, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            status, _ = await transport.get(f"{API_URL}/health", timeout=1.0)
+            if status < 300:
+                return
+        except Exception:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError("API não respondeu ao /health")
+
+
+async def wait_drained(client: redis.Redis, timeout: float):
+    # Fila, filas de processamento e retentativas vazias = workers terminaram
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        pending = await client.llen("payment_queue") + await client.zcard(
+            "payment_retry"
+        )
+        async for key in client.scan_iter("payment_queue:processing:*"):
+            pending += await client.llen(key)
+        if not pending:
+            return 0
+        await asyncio.sleep(0.25)
+    return pending
+
+
+async def run(args):
+    scenario = SCENARIOS[args.scenario]
+    stubs = {
+        "default": ProcessorStub("default", 0.05, DEFAULT_PORT, seed=1),
+        "fallback": ProcessorStub("fallback", 0.15, FALLBACK_PORT, seed=2),
+    }
+    for stub in stubs.values():
+        stub.configure(jitter_ms=args.jitter, reject_rate=args.reject_rate)
+        await stub.start("127.0.0.1")
+
+    processes = (
+        spawn_services(args.workers, args.redis_host, args.worker_processes)
+        if args.spawn
+        else []
+    )
+    generator = LoadGenerator(args.vus, args.duration)
+    client = redis.Redis(host=args.redis_host, port=6379)
+    try:
+        await wait_ready(generator.transport)
+        await generator.transport.post(f"{API_URL}/purge", b"", timeout=5.0)
+
+        started = time.time()
+        await asyncio.gather(
+            generator.run(), apply_stages(stubs, scenario, args.duration)
+        )
+        finished = time.time()
+        elapsed = finished - started
+
+        pending = await wait_drained(client, args.drain_timeout)
+        drained = time.time()
+        query = f"from={iso(started - 1)}&to={iso(time.time())}"
+        _, content = await generator.transport.get(
+            f"{API_URL}/payments-summary?{query}", timeout=5.0
+        )
+        backend = orjson.loads(content)
+    finally:
+        await generator.transport.aclose()
+        await client.aclose()
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait()
+        for stub in stubs.values():
+            await stub.close()
+
+    latencies = sorted(generator.latencies)
+    ok = sum(count for status, count in generator.statuses.items() if status < 300)
+    print()
+    print(
+        f"cenário:              {args.scenario} ({args.vus} VUs, {args.duration:.0f}s)"
+    )
+    print(f"requisições:          {len(latencies) + generator.errors} ({ok} aceitas)")
+    print(
+        f"status:               {dict(sorted(generator.statuses.items()))} erros {generator.errors}"
+    )
+    print(f"vazão:                {ok / elapsed:.1f} req/s")
+    print(
+        f"latência POST:        p50 {percentile(latencies, 50):.2f} ms  "
+        f"p99 {percentile(latencies, 99):.2f} ms  p99.9 {percentile(latencies, 99.9):.2f} ms"
+    )
+    if pending:
+        print(f"pendentes após drain: {pending}")
+    processed = sum(backend[name]["totalRequests"] for name in stubs)
+    print(
+        f"pagamentos:           {processed / (drained - started):.1f}/s "
+        f"({args.workers} workers x {args.worker_processes} processos)"
+    )
+
+    mismatches = 0
+    total_fee = 0.0
+    for name, stub in stubs.items():
+        expected = stub.summary()
+        got = backend[name]
+        diff = abs(expected["totalRequests"] - got["totalRequests"])
+        mismatches += diff
+        total_fee += got["totalAmount"] * stub.fee
+        print(
+            f"{name:<9} backend {got['totalRequests']:>6} / R$ {got['totalAmount']:>10.2f}"
+            f"  processor {expected['totalRequests']:>6} / R$ {expected['totalAmount']:>10.2f}"
+            f"  taxa R$ {got['totalAmount'] * stub.fee:.2f}  chamadas {stub.calls}"
+        )
+    print(f"inconsistências:      {mismatches}")
+    print(f"taxas totais:         R$ {total_fee:.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Carga local no estilo da rinha")
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS), default="rinha")
+    parser.add_argument("--vus", type=int, default=500)
+    parser.add_argument("--duration", type=float, default=60.0)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument(
+        "--worker-processes",
+        type=int,
+        default=1,
+        help="WORKER_PROCESSES de cada worker",
+    )
+    parser.add_argument(
+        "--jitter", type=int, default=0, help="jitter de latência em ms"
+    )
+    parser.add_argument("--reject-rate", type=float, default=0.0, help="fração de 422")
+    parser.add_argument("--redis-host", default="127.0.0.1")
+    parser.add_argument("--drain-timeout", type=float, default=30.0)
+    parser.add_argument(
+        "--no-spawn",
+        dest="spawn",
+        action="store_false",
+        help="usa API e workers já rodando na 9999",
+    )
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
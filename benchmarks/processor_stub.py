@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""Processor de pagamentos local para benchmarks: mesma API do
+payment-processor da rinha (POST /payments, GET /payments/service-health,
+rotas /admin), com latência, janelas de falha, 422 e rate limit do health
+controláveis por código ou pelas rotas /admin/configurations.
+
+Uso: python -m benchmarks.processor_stub [porta] [taxa]
+"""
+
+import asyncio
+import random
+import sys
+import time
+from typing import Dict, Optional, Tuple
+from urllib.parse import parse_qsl, urlsplit
+
+import orjson
+
+from app.utils import iso_to_timestamp, round_to_cents
+
+STATUS_TEXT = {
+    200: b"OK",
+    204: b"No Content",
+    404: b"Not Found",
+    422: b"Unprocessable Entity",
+    429: b"Too Many Requests",
+    500: b"Internal Server Error",
+}
+
+
+class ProcessorStub:
+    def __init__(
+        self,
+        name: str,
+        fee: float,
+        port: int,
+        health_interval: float = 5.0,
+        seed: Optional[int] = None,
+    ):
+        self.name = name
+        self.fee = fee
+        self.port = port
+        # O processor real aceita uma chamada ao health a cada 5s
+        self.health_interval = health_interval
+        self.delay_ms = 0
+        self.jitter_ms = 0
+        self.failing = False
+        # Fração das requisições válidas recusadas com 422
+        self.reject_rate = 0.0
+        self.payments: Dict[str, Tuple[int, float]] = {}
+        self.calls = {
+            "payments": 0,
+            "failed": 0,
+            "rejected": 0,
+            "health": 0,
+            "throttled": 0,
+        }
+        self._last_health = 0.0
+        self._random = random.Random(seed)
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    def configure(
+        self,
+        delay_ms: Optional[int] = None,
+        failing: Optional[bool] = None,
+        jitter_ms: Optional[int] = None,
+        reject_rate: Optional[float] = None,
+    ):
+        if delay_ms is not None:
+            self.delay_ms = delay_ms
+        if failing is not None:
+            self.failing = failing
+        if jitter_ms is not None:
+            self.jitter_ms = jitter_ms
+        if reject_rate is not None:
+            self.reject_rate = reject_rate
+
+    def purge(self):
+        self.payments.clear()
+        for key in self.calls:
+            self.calls[key] = 0
+
+    def summary(self, ts_from: Optional[float] = None, ts_to: Optional[float] = None):
+        count = 0
+        cents = 0
+        for amount_cents, requested_at in self.payments.values():
+            if ts_from is not None and requested_at < ts_from:
+                continue
+            if ts_to is not None and requested_at > ts_to:
+                continue
+            count += 1
+            cents += amount_cents
+        amount = cents / 100
+        return {
+            "totalRequests": count,
+            "totalAmount": round_to_cents(amount),
+            "totalFee": round_to_cents(amount * self.fee),
+            "feePerTransaction": self.fee,
+        }
+
+    async def start(self, host: str = "0.0.0.0"):
+        self._server = await asyncio.start_server(self._handle, host, self.port)
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    async def _payment(self, body: bytes) -> Tuple[int, bytes]:
+        self.calls["payments"] += 1
+        delay = self.delay_ms + (
+            self._random.uniform(0, self.jitter_ms) if self.jitter_ms else 0
+        )
+        if delay:
+            await asyncio.sleep(delay / 1000)
+
+        if self.failing:
+            self.calls["failed"] += 1
+            return 500, b""
+
+        try:
+            payment = orjson.loads(body)
+            cid = payment["correlationId"]
+            amount = payment["amount"]
+            requested_at, ok = iso_to_timestamp(payment["requestedAt"])
+        except (KeyError, TypeError, ValueError):
+            return 422, b""
+
+        if not ok or cid in self.payments or self._random.random() < self.reject_rate:
+            self.calls["rejected"] += 1
+            return 422, b""
+
+        self.payments[cid] = (int(round(amount * 100)), float(requested_at))
+        return 200, b'{"message":"payment processed successfully"}'
+
+    def _health(self) -> Tuple[int, bytes]:
+        now = time.monotonic()
+        if now - self._last_health < self.health_interval:
+            self.calls["throttled"] += 1
+            return 429, b""
+        self._last_health = now
+        self.calls["health"] += 1
+        return 200, orjson.dumps(
+            {"failing": self.failing, "minResponseTime": self.delay_ms}
+        )
+
+    def _admin_summary(self, query: str) -> Tuple[int, bytes]:
+        params = dict(parse_qsl(query))
+        bounds = []
+        for key in ("from", "to"):
+            value, ok = iso_to_timestamp(params.get(key, ""))
+            bounds.append(float(value) if ok else None)
+        return 200, orjson.dumps(self.summary(*bounds))
+
+    def _admin_configure(self, path: str, body: bytes) -> Tuple[int, bytes]:
+        data = orjson.loads(body or b"{}")
+        if path.endswith("/delay"):
+            self.configure(delay_ms=int(data.get("delay", 0)))
+        elif path.endswith("/failure"):
+            self.configure(failing=bool(data.get("failure", False)))
+        # /token é aceito e ignorado
+        return 204, b""
+
+    async def _route(
+        self, method: bytes, target: bytes, body: bytes
+    ) -> Tuple[int, bytes]:
+        parts = urlsplit(target.decode())
+        path = parts.path
+        if method == b"POST" and path == "/payments":
+            return await self._payment(body)
+        if method == b"GET" and path == "/payments/service-health":
+            return self._health()
+        if method == b"GET" and path == "/admin/payments-summary":
+            return self._admin_summary(parts.query)
+        if method == b"POST" and path == "/admin/purge-payments":
+            self.purge()
+            return 200, b'{"message":"All payments purged."}'
+        if method == b"PUT" and path.startswith("/admin/configurations/"):
+            return self._admin_configure(path, body)
+        return 404, b""
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    return
+                method, target, _ = request_line.split(b" ", 2)
+
+                length = 0
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    if line.lower().startswith(b"content-length:"):
+                        length = int(line.split(b":", 1)[1])
+                body = await reader.readexactly(length) if length else b""
+
+                status, content = await self._route(method, target, body)
+                writer.write(
+                    b"HTTP/1.1 %d %s\r\n"
+                    b"Content-Type: application/json\r\n"
+                    b"Content-Length: %d\r\n\r\n"
+                    % (status, STATUS_TEXT[status], len(content))
+                    + content
+                )
+                await writer.drain()
+        except (
+            ConnectionError,
+            asyncio.IncompleteReadError,
+            asyncio.CancelledError,
+            ValueError,
+        ):
+            pass
+        finally:
+            writer.close()
+
+
+async def serve(port: int, fee: float):
+    stub = ProcessorStub(f"stub-{port}", fee, port)
+    await stub.start()
+    print(f"processor local na porta {port} (taxa {fee})")
+    await asyncio.Event().wait()
+
+
+def main():
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8001
+    fee = float(sys.argv[2]) if len(sys.argv) > 2 else 0.05
+    asyncio.run(serve(port, fee))
+
+
+if __name__ == "__main__":
+    main()
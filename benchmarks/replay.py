@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""Reproduz uma captura do POST /payments (CAPTURE_PATH) contra a API
+mantendo os intervalos originais entre as requisições, em 1x ou com a
+velocidade escalada por --speed. Cada arquivo é ordenado pelo timestamp
+(vários processos da API anexam blocos intercalados ao mesmo arquivo) e
+vários arquivos são intercalados entre si.
+
+Relata status, latência p50/p99/p99.9, o atraso do envio em relação ao
+horário programado (se crescer, o próprio replay virou o gargalo) e o
+/payments-summary no fim, para comparar builds com o mesmo tráfego.
+
+Uso: python -m benchmarks.replay captura.jsonl [outra.bin ...] [--speed 1]
+     [--url http://127.0.0.1:9999] [--purge] [--limit N]
+"""
+
+import argparse
+import asyncio
+import heapq
+import time
+from typing import Dict, List
+
+from app.capture import read_capture
+from app.client.transport import RawHttpTransport
+from benchmarks.loadgen import API_URL, percentile
+
+
+def capture_time(record) -> int:
+    return record[0]
+
+
+class Replayer:
+    def __init__(self, url: str, speed: float, max_idle: int):
+        self.url = url
+        self.speed = speed
+        self.transport = RawHttpTransport(max_idle=max_idle)
+        self.latencies: List[float] = []
+        self.lags: List[float] = []
+        self.statuses: Dict[int, int] = {}
+        self.errors = 0
+
+    async def post(self, body: bytes):
+        start = time.perf_counter()
+        try:
+            status, _ = await self.transport.post(
+                f"{self.url}/payments", body, timeout=5.0
+            )
+        except Exception:
+            self.errors += 1
+            return
+        self.latencies.append((time.perf_counter() - start) * 1000)
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+
+    async def run(self, records) -> float:
+        tasks = set()
+        first_us = None
+        started = time.monotonic()
+        for received_us, body in records:
+            if first_us is None:
+                first_us = received_us
+            due = started + (received_us - first_us) / 1e6 / self.speed
+            delay = due - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self.lags.append(max(0.0, time.monotonic() - due) * 1000)
+
+            task = asyncio.create_task(self.post(body))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+
+        await asyncio.gather(*tasks)
+        return time.monotonic() - started
+
+
+async def run(args):
+    # Os blocos de cada processo chegam ao arquivo na ordem dos flushes, não
+    # na das requisições: ordena cada arquivo antes de intercalar
+    records = heapq.merge(
+        *(sorted(read_capture(path), key=capture_time) for path in args.captures),
+        key=capture_time,
+    )
+    if args.limit:
+        records = (record for _, record in zip(range(args.limit), records))
+
+    replayer = Replayer(args.url, args.speed, args.max_idle)
+    try:
+        if args.purge:
+            await replayer.transport.post(f"{args.url}/purge", b"", timeout=5.0)
+        elapsed = await replayer.run(records)
+        _, summary = await replayer.transport.get(
+            f"{args.url}/payments-summary", timeout=5.0
+        )
+    finally:
+        await replayer.transport.aclose()
+
+    latencies = sorted(replayer.latencies)
+    lags = sorted(replayer.lags)
+    sent = len(lags)
+    rate = sent / max(elapsed, 1e-9)
+    print(f"requisições:   {sent} em {elapsed:.1f}s ({rate:.1f} req/s, {args.speed}x)")
+    print(
+        f"status:        {dict(sorted(replayer.statuses.items()))} erros {replayer.errors}"
+    )
+    print(
+        f"latência POST: p50 {percentile(latencies, 50):.2f} ms  "
+        f"p99 {percentile(latencies, 99):.2f} ms  p99.9 {percentile(latencies, 99.9):.2f} ms"
+    )
+    print(
+        f"atraso envio:  p50 {percentile(lags, 50):.2f} ms  p99 {percentile(lags, 99):.2f} ms"
+    )
+    print(f"summary:       {summary.decode()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Replay de uma captura do POST /payments"
+    )
+    parser.add_argument(
+        "captures", nargs="+", help="arquivos de CAPTURE_PATH (.jsonl ou .bin)"
+    )
+    parser.add_argument(
+        "--speed", type=float, default=1.0, help="2 = duas vezes mais rápido"
+    )
+    parser.add_argument("--url", default=API_URL)
+    parser.add_argument(
+        "--purge", action="store_true", help="chama /purge antes do replay"
+    )
+    parser.add_argument(
+        "--limit", type=int, default=0, help="só as primeiras N requisições"
+    )
+    parser.add_argument("--max-idle", type=int, default=500, help="conexões keep-alive")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""Simulação de eventos discretos das estratégias de roteamento
+(app.processor.routing) contra traces de latência e falha dos processors,
+sem Redis nem rede. Relata vazão, p99 da conclusão (chegada até o processor
+aceitar), pagamentos perdidos e o valor líquido depois das taxas.
+
+O modelo segue o worker: o estado de saúde visto pelas estratégias é o da
+última consulta do líder (a cada HEALTH_INTERVAL), cada processor atende até
+CONCURRENCY chamadas ao mesmo tempo (o resto espera na fila dele), falhas
+tentam o próximo processor da ordem e depois viram retentativas com backoff,
+e uma ordem vazia segura o pagamento por ROUTING_HOLD_MS.
+
+Um trace é um JSON {"default": [[início_s, fim_s, falhando, latência_ms], ...],
+"fallback": [...]}; fora dos trechos o processor responde em 10 ms.
+
+Uso: python -m benchmarks.routing_sim [--scenario rinha|outage|slow|steady]
+     [--trace arquivo.json] [--rate 250] [--duration 60] [--seed 1]
+"""
+
+import argparse
+import heapq
+import random
+from typing import Dict, List, Tuple
+
+import orjson
+
+from app.processor.routing import FEES, ROUTING_HOLD_MS, STRATEGIES
+from app.worker.retry import MAX_RETRIES, retry_delay_ms
+
+AMOUNT = 19.90
+CONCURRENCY = 50
+HEALTH_INTERVAL = 5.0
+HEALTHY_MS = 10.0
+# Tempo até um processor falhando devolver o 500
+FAILURE_MS = 5.0
+# Variação aleatória de cada chamada em torno da latência do trace
+JITTER = 0.2
+
+Segment = Tuple[float, float, bool, float]
+
+SCENARIOS: Dict[str, Dict[str, List[Segment]]] = {
+    "steady": {"default": [], "fallback": []},
+    # Quedas do default, uma longa e uma curta
+    "outage": {
+        "default": [(15, 30, True, HEALTHY_MS), (40, 43, True, HEALTHY_MS)],
+        "fallback": [],
+    },
+    # Default degradando até 1.5 s enquanto o fallback segue em 100 ms
+    "slow": {
+        "default": [(15, 25, False, 400), (25, 40, False, 1500)],
+        "fallback": [(0, 60, False, 100)],
+    },
+    # Parecido com o teste da rinha: quedas curtas e latência variável nos dois
+    "rinha": {
+        "default": [
+            (10, 14, True, HEALTHY_MS),
+            (20, 30, False, 800),
+            (35, 37, True, HEALTHY_MS),
+            (45, 55, False, 300),
+        ],
+        "fallback": [(0, 60, False, 60), (28, 31, True, 60)],
+    },
+}
+
+
+class SimProcessor:
+    def __init__(self, name: str, segments: List[Segment], concurrency: int):
+        self.name = name
+        self.segments = sorted(segments)
+        self.concurrency = concurrency
+        self.busy = 0
+        self.waiting: List[int] = []
+        self.calls = 0
+
+    def state_at(self, t: float) -> Tuple[bool, float]:
+        for start, end, failing, latency_ms in self.segments:
+            if start <= t < end:
+                return failing, latency_ms
+        return False, HEALTHY_MS
+
+
+class Simulation:
+    def __init__(self, strategy, traces, rate: float, duration: float, seed: int):
+        self.strategy = strategy
+        self.processors = {
+            name: SimProcessor(name, traces.get(name, []), CONCURRENCY) for name in FEES
+        }
+        self.rate = rate
+        self.duration = duration
+        self.random = random.Random(seed)
+        # retry_delay_ms usa o random global
+        random.seed(seed)
+        self.events: List[Tuple] = []
+        self.sequence = 0
+        self.arrival: Dict[int, float] = {}
+        self.retries: Dict[int, int] = {}
+        self.order: Dict[int, List[str]] = {}
+        self.latencies: List[float] = []
+        self.completed: Dict[str, int] = {name: 0 for name in FEES}
+        self.given_up = 0
+        self.holds = 0
+        self.last_completion = 0.0
+
+    def schedule(self, t: float, kind: str, *data):
+        self.sequence += 1
+        heapq.heappush(self.events, (t, self.sequence, kind, data))
+
+    def health_view(self, t: float) -> Dict[str, Dict]:
+        # O líder consulta o service-health a cada HEALTH_INTERVAL
+        checked_at = t - t % HEALTH_INTERVAL
+        view = {}
+        for name, processor in self.processors.items():
+            failing, latency_ms = processor.state_at(checked_at)
+            view[name] = {"failing": failing, "minResponseTime": int(latency_ms)}
+        return view
+
+    def route(self, t: float, payment: int):
+        age_ms = (t - self.arrival[payment]) * 1000
+        order = self.strategy.route(self.health_view(t), age_ms)
+        if not order:
+            self.holds += 1
+            self.schedule(t + ROUTING_HOLD_MS / 1000, "route", payment)
+            return
+        self.order[payment] = list(order)
+        self.call(t, payment)
+
+    def call(self, t: float, payment: int):
+        processor = self.processors[self.order[payment][0]]
+        if processor.busy >= processor.concurrency:
+            processor.waiting.append(payment)
+            return
+        self.start(t, processor, payment)
+
+    def start(self, t: float, processor: SimProcessor, payment: int):
+        processor.busy += 1
+        processor.calls += 1
+        failing, latency_ms = processor.state_at(t)
+        if failing:
+            latency_ms = FAILURE_MS
+        latency_ms *= 1 + self.random.uniform(-JITTER, JITTER)
+        self.schedule(
+            t + latency_ms / 1000, "done", payment, processor.name, not failing
+        )
+
+    def done(self, t: float, payment: int, name: str, ok: bool):
+        processor = self.processors[name]
+        processor.busy -= 1
+        if processor.waiting:
+            self.start(t, processor, processor.waiting.pop(0))
+
+        if ok:
+            self.completed[name] += 1
+            self.latencies.append((t - self.arrival.pop(payment)) * 1000)
+            self.last_completion = t
+            return
+
+        order = self.order[payment]
+        order.pop(0)
+        if order:
+            self.call(t, payment)
+            return
+
+        retries = self.retries.get(payment, 0)
+        if retries >= MAX_RETRIES:
+            self.given_up += 1
+            del self.arrival[payment]
+            return
+        self.retries[payment] = retries + 1
+        self.schedule(t + retry_delay_ms(retries) / 1000, "route", payment)
+
+    def run(self) -> Dict:
+        # Chegadas de Poisson durante a carga; depois só drena
+        t = 0.0
+        payment = 0
+        while True:
+            t += self.random.expovariate(self.rate)
+            if t >= self.duration:
+                break
+            self.arrival[payment] = t
+            self.schedule(t, "route", payment)
+            payment += 1
+
+        while self.events:
+            t, _, kind, data = heapq.heappop(self.events)
+            if kind == "route":
+                self.route(t, *data)
+            else:
+                self.done(t, *data)
+
+        latencies = sorted(self.latencies)
+        p99 = 0.0
+        if latencies:
+            p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+        completed = sum(self.completed.values())
+        gross = completed * AMOUNT
+        fees = sum(
+            count * AMOUNT * FEES[name] for name, count in self.completed.items()
+        )
+        return {
+            "payments": payment,
+            "completed": dict(self.completed),
+            "given_up": self.given_up,
+            "holds": self.holds,
+            "throughput": completed / max(self.last_completion, self.duration),
+            "p99_ms": p99,
+            "fees": fees,
+            "net": gross - fees,
+        }
+
+
+def load_traces(args) -> Dict[str, List[Segment]]:
+    if args.trace:
+        with open(args.trace, "rb") as f:
+            return {
+                name: [tuple(segment) for segment in segments]
+                for name, segments in orjson.loads(f.read()).items()
+            }
+    return SCENARIOS[args.scenario]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Simulador das estratégias de roteamento"
+    )
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS), default="rinha")
+    parser.add_argument("--trace", help="trace JSON no lugar do cenário")
+    parser.add_argument(
+        "--rate", type=float, default=250.0, help="pagamentos por segundo"
+    )
+    parser.add_argument("--duration", type=float, default=60.0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--strategies", nargs="*", default=list(STRATEGIES))
+    args = parser.parse_args()
+
+    traces = load_traces(args)
+    print(
+        f"cenário: {args.trace or args.scenario}, {args.rate:.0f}/s por {args.duration:.0f}s"
+    )
+    print(
+        f"{'estratégia':<10} {'default':>8} {'fallback':>8} {'perdidos':>8} "
+        f"{'segurados':>9} {'vazão/s':>8} {'p99 ms':>9} {'taxas R$':>10} {'líquido R$':>11}"
+    )
+    for name in args.strategies:
+        result = Simulation(
+            STRATEGIES[name](), traces, args.rate, args.duration, args.seed
+        ).run()
+        print(
+            f"{name:<10} {result['completed']['default']:>8} "
+            f"{result['completed']['fallback']:>8} {result['given_up']:>8} "
+            f"{result['holds']:>9} {result['throughput']:>8.1f} {result['p99_ms']:>9.1f} "
+            f"{result['fees']:>10.2f} {result['net']:>11.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()